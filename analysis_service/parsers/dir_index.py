@@ -0,0 +1,122 @@
+"""
+Directory Index
+Walks an extracted directory tree once so several parsers can share the listing
+"""
+
+import os
+from typing import Callable, Iterable, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def iter_dirs(root: str, prune: Optional[Callable[[os.DirEntry], bool]] = None) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield the directories under root, in os.walk (top-down) order
+
+    Like os.walk, symlinks to directories are yielded but not descended into.
+    Uses the d_type information from os.scandir, so no entry is stat'ed.
+
+    Args:
+        root: Directory to walk
+        prune: Directories for which this returns True are yielded but not descended into
+
+    Returns:
+        Iterator of DirEntry objects, one per subdirectory
+    """
+    subdirs = []
+
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry)
+                except OSError as e:
+                    logger.debug(f"Skipping {entry.path}: {e}")
+    except OSError as e:
+        logger.warning(f"Error listing {root}: {e}")
+
+    yield from subdirs
+
+    for entry in subdirs:
+        if not entry.is_symlink() and not (prune and prune(entry)):
+            yield from iter_dirs(entry.path, prune)
+
+
+class DirIndex:
+    """Snapshot of the files under a directory, built with a single walk"""
+
+    def __init__(self, root: str, prune: Optional[Callable[[os.DirEntry], bool]] = None):
+        """
+        Walk the directory tree and record every regular file, or symlink to one
+
+        Entries are os.DirEntry objects, so a parser that needs a file's
+        size calls entry.stat() and the result is cached on the entry.
+
+        Args:
+            root: Directory to index
+            prune: Subdirectories for which this returns True are not walked
+        """
+        self.root = os.path.normpath(root)
+        self._prune = prune
+        self.entries: List[os.DirEntry] = list(self._scan(self.root))
+        logger.info(f"Indexed {len(self.entries)} files under {self.root}")
+
+    def _scan(self, path: str) -> Iterator[os.DirEntry]:
+        """Recursively yield file entries, files of a directory before its subdirectories"""
+        subdirs = []
+
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # Like os.walk, symlinked files are listed but
+                        # symlinked directories are not descended into
+                        if entry.is_dir():
+                            if not entry.is_symlink() and not (self._prune and self._prune(entry)):
+                                subdirs.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError as e:
+                        logger.debug(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Error listing {path}: {e}")
+
+        for subdir in subdirs:
+            yield from self._scan(subdir)
+
+    def _iter_under(self, under: Optional[str]) -> Iterable[os.DirEntry]:
+        """Entries inside the given subdirectory (all entries if None)"""
+        if under is None:
+            return self.entries
+
+        prefix = os.path.normpath(under) + os.sep
+        return (entry for entry in self.entries if entry.path.startswith(prefix))
+
+    def iter_by_ext(self, extensions: Iterable[str], under: Optional[str] = None) -> Iterator[os.DirEntry]:
+        """
+        Iterate files whose name ends with one of the extensions
+
+        Args:
+            extensions: File extensions (e.g. ['.log', '.txt'])
+            under: Only include files inside this directory
+
+        Returns:
+            Iterator of matching DirEntry objects
+        """
+        suffixes = tuple(extensions)
+        return (entry for entry in self._iter_under(under) if entry.name.endswith(suffixes))
+
+    def iter_by_suffix(self, suffix: str, under: Optional[str] = None) -> Iterator[os.DirEntry]:
+        """
+        Iterate files whose name ends with the given suffix
+
+        Args:
+            suffix: Filename suffix (e.g. '-validation_report.json')
+            under: Only include files inside this directory
+
+        Returns:
+            Iterator of matching DirEntry objects
+        """
+        return self.iter_by_ext((suffix,), under)
@@ -3,21 +3,130 @@ Must-Gather Parser
 Parses must-gather logs and correlates with test failures
 """
 
+import heapq
 import os
 import re
-from typing import List, Dict
+from collections import deque
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 
+from analysis_service.parsers.dir_index import DirIndex
+
 logger = logging.getLogger(__name__)
 
+# Severity words that boost a log line's relevance score
+_SEVERITY_RE = re.compile(rb'error|warn|fail', re.IGNORECASE)
+
+# Directories that never hold relevant logs (VCS data, image layers, caches)
+_NOISE_DIRS = frozenset({'.git', 'blobs', 'sha256', 'node_modules', '__pycache__'})
+
+# Word tokens in test names (test_volume_create -> volume, create)
+_TEST_TOKEN_RE = re.compile(r'[a-z]+')
+# UUIDs in error messages (potential resource identifiers)
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+# Common OpenStack service names
+_SERVICE_TERMS = ('nova', 'cinder', 'neutron', 'glance', 'keystone', 'heat', 'swift')
+# Resource types
+_RESOURCE_TERMS = frozenset({'volume', 'instance', 'network', 'port', 'router', 'image', 'server', 'snapshot'})
+# Error types
+_ERROR_TERMS = ('timeout', 'error', 'failure', 'exception', 'denied', 'not found', 'conflict')
+
+# Term found in a failure -> keyword used to search logs
+_TERM_KEYWORDS = {term: term.replace(' ', '_') for term in (*_SERVICE_TERMS, *_RESOURCE_TERMS, *_ERROR_TERMS)}
+# Lookahead so overlapping terms are all found, like separate substring checks
+_TERMS_RE = re.compile('(?=(' + '|'.join(map(re.escape, sorted(_TERM_KEYWORDS, key=len, reverse=True))) + '))')
+
+# Read size for binary log scanning, and the typical log line length
+# used to size the first read of a file's head
+_READ_CHUNK_SIZE = 64 * 1024
+_LINE_SIZE_ESTIMATE = 256
+
+# Bytes of each upcoming log file to ask the kernel to read ahead
+_PREFETCH_SIZE = 1024 * 1024
+
+
+def is_noise_dir(entry: os.DirEntry) -> bool:
+    """
+    Whether a directory is skipped when searching for logs (noise or hidden)
+
+    Pass as the prune callback of a DirIndex given to find_related_logs.
+    """
+    return entry.name in _NOISE_DIRS or entry.name.startswith('.')
+
+
+def _keyword_pattern(keywords: List[str], binary: bool = False) -> re.Pattern:
+    """
+    Get a single compiled pattern matching any of the keywords
+
+    See _keyword_matcher for how matches map to keywords.
+
+    Args:
+        keywords: Keywords to match
+        binary: Compile a bytes pattern instead of a str pattern
+
+    Returns:
+        Compiled regex pattern
+    """
+    return _keyword_matcher(keywords, binary)[0]
+
+
+def _keyword_matcher(keywords: List[str], binary: bool = False) -> Tuple[re.Pattern, List[frozenset]]:
+    """
+    Get a keyword pattern plus the keywords implied by each match
+
+    The pattern is a lookahead alternation, longest keyword first, so every
+    position is tested and the longest keyword starting there is matched.
+    Each keyword has its own group; match.lastindex says which one matched.
+    Keywords contained in that one also occur, so mapping each group to
+    all keywords it contains yields exactly the set a separate
+    `keyword in text` check per keyword would. Matching ignores case, so
+    text needs no lowercasing.
+
+    Args:
+        keywords: Keywords to match
+        binary: Compile a bytes pattern instead of a str pattern
+
+    Returns:
+        Tuple of (compiled pattern, implied keywords indexed by group number)
+    """
+    return _compile_keyword_matcher(tuple(sorted(set(keywords))), binary)
+
+
+@lru_cache(maxsize=64)
+def _compile_keyword_matcher(keywords: Tuple[str, ...], binary: bool) -> Tuple[re.Pattern, List[frozenset]]:
+    """Compile a keyword matcher once per unique keyword set"""
+    alternatives = sorted(keywords, key=len, reverse=True)
+    groups = '|'.join(f'({re.escape(k)})' for k in alternatives)
+    source = f'(?={groups})' if alternatives else '(?!)'
+
+    pattern = re.compile(source.encode('utf-8') if binary else source, re.IGNORECASE)
+
+    # Group numbers start at 1
+    implied = [frozenset()] + [frozenset(other for other in alternatives if other in k) for k in alternatives]
+    return pattern, implied
+
 
 class MustGatherParser:
     """Parser for must-gather log directories"""
 
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize parser
+
+        Args:
+            max_workers: Maximum threads used to scan log contents
+                (defaults to 4 per CPU, capped at 32)
+        """
         self.log_extensions = ['.log', '.txt', '.out', '.err']
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._log_suffixes = tuple(self.log_extensions)
 
-    def find_related_logs(self, mustgather_path: str, test_name: str, error_message: str, max_results: int = 5) -> List[str]:
+    def find_related_logs(self, mustgather_path: str, test_name: str, error_message: str, max_results: int = 5,
+                          dir_index: Optional[DirIndex] = None) -> List[str]:
         """
         Find log files related to a test failure
 
@@ -26,6 +135,9 @@ class MustGatherParser:
             test_name: Name of the failed test
             error_message: Error message from test failure
             max_results: Maximum number of log files to return
+            dir_index: Optional prebuilt index covering mustgather_path, built
+                with prune=is_noise_dir; lets repeated calls for many failures
+                share one directory walk
 
         Returns:
             List of relative paths to potentially related log files
@@ -37,48 +149,120 @@ class MustGatherParser:
         # Extract keywords from test name and error
         keywords = self._extract_keywords(test_name, error_message)
 
-        if not keywords:
+        if not keywords or max_results <= 0:
             return []
 
         logger.info(f"Searching for logs with keywords: {keywords}")
 
-        # Search for relevant log files
-        related_logs = []
+        # Score all file names in one pass, then keep those that match as
+        # candidates with an upper bound on the total score each could reach
+        if dir_index is not None:
+            entries = list(dir_index.iter_by_ext(self._log_suffixes, under=mustgather_path))
+        else:
+            entries = list(self._iter_logs(mustgather_path, keywords))
+        filename_scores = self._score_filenames([entry.name.lower() for entry in entries], keywords)
+
+        candidates = []
+        # Each distinct keyword scores at most 3 on a line, over at most 500
+        # lines, and a line can only match if it holds the shortest keyword
+        max_line_score = 3 * len(set(keywords))
+        shortest_keyword = min(len(k.encode('utf-8')) for k in keywords)
+
+        for entry, filename_score in zip(entries, filename_scores):
+            if filename_score > 0:
+                upper_bound = filename_score
+                scan_size = None
+                try:
+                    file_size = entry.stat(follow_symlinks=False).st_size
+                    # Quick content check for smaller files only (< 10MB)
+                    if file_size < 10 * 1024 * 1024:
+                        scan_size = file_size
+                        upper_bound += max_line_score * min(500, file_size // shortest_keyword)
+                except OSError as e:
+                    logger.warning(f"Error scanning {entry.path}: {e}")
+
+                candidates.append((entry.path, filename_score, scan_size, upper_bound))
+
+        # Keep the best max_results in a min-heap of (score, -index, path);
+        # the index breaks ties in favour of files found earlier
+        top_logs = []
+
+        # Visit the most promising candidates first so that, once the heap
+        # is full, the rest can be dropped without scanning their contents
+        order = sorted(range(len(candidates)), key=lambda i: (candidates[i][3], -i), reverse=True)
+
+        def scan_candidate(index: int) -> int:
+            file_path, _, scan_size, _ = candidates[index]
+            if scan_size is None:
+                return 0
+            return self._scan_log_content(file_path, keywords, 500, file_size=scan_size)
+
+        # Scan candidate contents concurrently; file reads release the GIL
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch_start in range(0, len(order), self.max_workers):
+                batch = order[batch_start:batch_start + self.max_workers]
+
+                if len(top_logs) >= max_results:
+                    batch = [i for i in batch if (candidates[i][3], -i) > top_logs[0][:2]]
+                    if not batch:
+                        break
 
-        for root, dirs, files in os.walk(mustgather_path):
-            for file in files:
-                if not any(file.endswith(ext) for ext in self.log_extensions):
-                    continue
+                content_scores = executor.map(scan_candidate, batch)
 
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, mustgather_path)
+                # Let the kernel start reading the next batch while this one is scanned
+                next_batch = order[batch_start + self.max_workers:batch_start + 2 * self.max_workers]
+                self._prefetch([(candidates[i][0], candidates[i][2]) for i in next_batch])
 
-                # Check if filename matches keywords
-                filename_score = self._calculate_relevance_score(file.lower(), keywords)
+                for index, content_score in zip(batch, content_scores):
+                    file_path, filename_score, _, _ = candidates[index]
+                    item = (filename_score + content_score, -index, file_path)
 
-                if filename_score > 0:
-                    # Quick content check for smaller files
-                    content_score = 0
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        if file_size < 10 * 1024 * 1024:  # Only scan files < 10MB
-                            content_score = self._scan_log_content(file_path, keywords, max_lines=500)
-                    except Exception as e:
-                        logger.warning(f"Error scanning {file_path}: {e}")
-
-                    total_score = filename_score + content_score
-
-                    if total_score > 0:
-                        related_logs.append({
-                            'path': rel_path,
-                            'score': total_score,
-                            'filename_score': filename_score,
-                            'content_score': content_score
-                        })
+                    if len(top_logs) < max_results:
+                        heapq.heappush(top_logs, item)
+                    elif item > top_logs[0]:
+                        heapq.heapreplace(top_logs, item)
+
+        # Return top results ordered by relevance score
+        return [os.path.relpath(file_path, mustgather_path) for _, _, file_path in sorted(top_logs, reverse=True)]
+
+    def _iter_logs(self, path: str, keywords: Optional[List[str]] = None) -> Iterator[os.DirEntry]:
+        """
+        Recursively yield log file entries under a directory
+
+        Uses os.scandir so the file type and size come from the cached
+        DirEntry instead of separate stat calls per file. Hidden and known
+        noise directories are pruned; subdirectories whose names match a
+        keyword are visited first.
+
+        Args:
+            path: Directory to scan
+            keywords: Optional keywords used to order subdirectories
 
-        # Sort by relevance score and return top results
-        related_logs.sort(key=lambda x: x['score'], reverse=True)
-        return [log['path'] for log in related_logs[:max_results]]
+        Returns:
+            Iterator of DirEntry objects for files with a log extension
+        """
+        subdirs = []
+
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not is_noise_dir(entry):
+                                subdirs.append(entry)
+                        elif entry.is_file(follow_symlinks=False) and entry.name.endswith(self._log_suffixes):
+                            yield entry
+                    except OSError as e:
+                        logger.debug(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Error listing {path}: {e}")
+
+        if keywords:
+            # Stable sort: matching subtrees first, otherwise listing order
+            subdirs.sort(key=lambda d: self._calculate_relevance_score(d.name.lower(), keywords) == 0)
+
+        for subdir in subdirs:
+            yield from self._iter_logs(subdir.path, keywords)
 
     def _extract_keywords(self, test_name: str, error_message: str) -> List[str]:
         """
@@ -95,31 +279,20 @@ class MustGatherParser:
 
         # Extract from test name
         # Example: test_volume_create_delete -> ['volume', 'create', 'delete']
-        test_parts = re.findall(r'[a-z]+', test_name.lower())
+        test_parts = _TEST_TOKEN_RE.findall(test_name.lower())
         keywords.update([part for part in test_parts if len(part) > 3])
 
-        # Extract from error message
-        # Look for common OpenStack service names
-        services = ['nova', 'cinder', 'neutron', 'glance', 'keystone', 'heat', 'swift']
-        for service in services:
-            if service in error_message.lower():
-                keywords.add(service)
-
-        # Extract resource types
-        resources = ['volume', 'instance', 'network', 'port', 'router', 'image', 'server', 'snapshot']
-        for resource in resources:
-            if resource in error_message.lower() or resource in test_name.lower():
-                keywords.add(resource)
-
-        # Extract error types
-        error_types = ['timeout', 'error', 'failure', 'exception', 'denied', 'not found', 'conflict']
-        for error_type in error_types:
-            if error_type in error_message.lower():
-                keywords.add(error_type.replace(' ', '_'))
+        # Look for OpenStack service names, resource types and error types
+        # in a single pass; resource types may also come from the test name
+        error_lower = error_message.lower()
+        combined = f"{error_lower}\n{test_name.lower()}"
+        for match in _TERMS_RE.finditer(combined):
+            term = match.group(1)
+            if match.start() < len(error_lower) or term in _RESOURCE_TERMS:
+                keywords.add(_TERM_KEYWORDS[term])
 
         # Extract UUIDs and IDs (potential resource identifiers)
-        uuid_pattern = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
-        uuids = re.findall(uuid_pattern, error_message.lower())
+        uuids = _UUID_RE.findall(error_lower)
         keywords.update(uuids[:3])  # Limit to first 3 UUIDs
 
         return list(keywords)
@@ -146,7 +319,115 @@ class MustGatherParser:
 
         return score
 
-    def _scan_log_content(self, file_path: str, keywords: List[str], max_lines: int = 500) -> int:
+    def _prefetch(self, files: List[Tuple[str, Optional[int]]]) -> None:
+        """
+        Ask the kernel to start readahead on files that will be scanned soon
+
+        Args:
+            files: (path, size) pairs; files with no size are not scanned
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return
+
+        for file_path, file_size in files:
+            if not file_size:
+                continue
+            try:
+                fd = os.open(file_path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, min(file_size, _PREFETCH_SIZE), os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.debug(f"Prefetch failed for {file_path}: {e}")
+
+    def _read_head(self, file_path: str, max_lines: int, file_size: Optional[int] = None) -> bytes:
+        """
+        Read the first lines of a file as raw bytes
+
+        Reads go straight to the unbuffered file, and the first read is
+        sized to hold max_lines typical log lines (or the whole file when
+        its size is known and smaller), so most files take a single read.
+
+        Args:
+            file_path: Path to file
+            max_lines: Number of lines to read
+            file_size: File size, if already known from a directory scan
+
+        Returns:
+            Bytes of up to max_lines lines
+        """
+        data = bytearray()
+        newlines = 0
+        read_size = max(_READ_CHUNK_SIZE, max_lines * _LINE_SIZE_ESTIMATE)
+        if file_size is not None:
+            read_size = min(read_size, max(file_size, 1))
+
+        with open(file_path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                # The head is read front to back; let the kernel read ahead
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+
+            while newlines < max_lines:
+                chunk = f.read(read_size)
+                if not chunk:
+                    break
+                newlines += chunk.count(b'\n')
+                data += chunk
+                if file_size is not None and len(data) >= file_size:
+                    break
+                read_size = _READ_CHUNK_SIZE
+
+        if newlines >= max_lines:
+            # Drop everything after the last wanted line
+            end = -1
+            for _ in range(max_lines):
+                end = data.find(b'\n', end + 1)
+            del data[end + 1:]
+
+        return bytes(data)
+
+    def _score_filenames(self, filenames: List[str], keywords: List[str]) -> List[int]:
+        """
+        Calculate relevance scores for many filenames at once
+
+        Equivalent to calling _calculate_relevance_score per filename, but
+        the keyword search runs once over all names joined by newlines.
+
+        Args:
+            filenames: Lowercased filenames to check
+            keywords: List of keywords
+
+        Returns:
+            Relevance score per filename (higher is more relevant)
+        """
+        pattern, implied = _keyword_matcher(keywords)
+
+        starts = []
+        offset = 0
+        for filename in filenames:
+            starts.append(offset)
+            offset += len(filename) + 1
+
+        # Keywords never contain a newline, so a match stays within one name
+        hits = {}
+        for match in pattern.finditer('\n'.join(filenames)):
+            index = bisect_right(starts, match.start()) - 1
+            hits.setdefault(index, set()).update(implied[match.lastindex])
+
+        scores = [0] * len(filenames)
+        for index, found in hits.items():
+            # Higher score for exact matches
+            exact = filenames[index].split('.')[0] in found
+            scores[index] = 2 * len(found) + (3 if exact else 0)
+
+        return scores
+
+    def _scan_log_content(self, file_path: str, keywords: List[str], max_lines: int = 500,
+                          file_size: Optional[int] = None) -> int:
         """
         Scan log file content for keyword matches
 
@@ -154,32 +435,49 @@ class MustGatherParser:
             file_path: Path to log file
             keywords: Keywords to search for
             max_lines: Maximum lines to scan
+            file_size: File size, if already known
 
         Returns:
             Content relevance score
         """
         score = 0
+        keyword_re, implied = _keyword_matcher(keywords, binary=True)
 
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for i, line in enumerate(f):
-                    if i >= max_lines:
-                        break
-
-                    line_lower = line.lower()
-                    for keyword in keywords:
-                        if keyword in line_lower:
-                            # Higher score for ERROR/WARN lines
-                            if 'error' in line_lower or 'warn' in line_lower or 'fail' in line_lower:
-                                score += 3
-                            else:
-                                score += 1
+            text = self._read_head(file_path, max_lines, file_size)
+
+            # Only lines containing a keyword are looked at; each distinct
+            # keyword on a line counts once, tripled on ERROR/WARN lines.
+            # Keywords never span lines, so a hit past line_end starts a new one
+            line_start = line_end = -1
+            line_hits = set()
+            for match in keyword_re.finditer(text):
+                position = match.start()
+                if position > line_end:
+                    score += self._score_line(text, line_start, line_end, line_hits)
+                    line_start = text.rfind(b'\n', 0, position) + 1
+                    line_end = text.find(b'\n', position)
+                    if line_end == -1:
+                        line_end = len(text)
+                    line_hits = set()
+                line_hits.update(implied[match.lastindex])
+            score += self._score_line(text, line_start, line_end, line_hits)
 
         except Exception as e:
             logger.debug(f"Error scanning {file_path}: {e}")
 
         return score
 
+    def _score_line(self, text: bytes, line_start: int, line_end: int, line_hits: set) -> int:
+        """Score the keyword hits found on text[line_start:line_end]"""
+        if not line_hits:
+            return 0
+
+        # Higher score for ERROR/WARN lines
+        if _SEVERITY_RE.search(text, line_start, line_end):
+            return 3 * len(line_hits)
+        return len(line_hits)
+
     def extract_log_excerpt(self, log_path: str, keywords: List[str], context_lines: int = 5) -> List[Dict]:
         """
         Extract relevant excerpts from a log file
@@ -193,29 +491,47 @@ class MustGatherParser:
             List of log excerpts with context
         """
         excerpts = []
+        keyword_re = _keyword_pattern(keywords)
+
+        # Stream the file keeping only the lines needed for context:
+        # `before` holds the preceding lines, `pending` tracks excerpts
+        # still waiting for their trailing lines as [context_parts, lines_left]
+        before = deque(maxlen=context_lines)
+        pending = []
 
         try:
             with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-
-            for i, line in enumerate(lines):
-                line_lower = line.lower()
-                if any(keyword in line_lower for keyword in keywords):
-                    # Get context
-                    start = max(0, i - context_lines)
-                    end = min(len(lines), i + context_lines + 1)
-
-                    excerpts.append({
-                        'line_number': i + 1,
-                        'matched_line': line.strip(),
-                        'context': ''.join(lines[start:end])
-                    })
-
-                    # Limit number of excerpts
+                for i, line in enumerate(f):
+                    if pending:
+                        for waiting in pending:
+                            waiting[0].append(line)
+                            waiting[1] -= 1
+                        pending = [waiting for waiting in pending if waiting[1] > 0]
+
+                    # Limit number of excerpts, but finish their trailing context
                     if len(excerpts) >= 10:
-                        break
+                        if not pending:
+                            break
+                        continue
+
+                    if keyword_re.search(line):
+                        context_parts = list(before)
+                        context_parts.append(line)
+
+                        excerpts.append({
+                            'line_number': i + 1,
+                            'matched_line': line.strip(),
+                            'context': context_parts
+                        })
+                        if context_lines > 0:
+                            pending.append([context_parts, context_lines])
+
+                    before.append(line)
 
         except Exception as e:
             logger.error(f"Error extracting from {log_path}: {e}")
 
+        for excerpt in excerpts:
+            excerpt['context'] = ''.join(excerpt['context'])
+
         return excerpts
@@ -5,13 +5,31 @@ Specifically targets neutron, cinder, manila validation_report.json files
 """
 
 import os
-import json
+import hashlib
 import logging
-from typing import Dict, List
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from analysis_service.parsers.dir_index import DirIndex
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
 logger = logging.getLogger(__name__)
 
+# Bump when the parsed result format changes so stale cache entries are ignored
+_PARSE_CACHE_VERSION = b'1'
+
 
 class RHCertAttachmentParser:
     """Parser for test results in rhcert XML attachments"""
@@ -28,11 +46,17 @@ class RHCertAttachmentParser:
         self.job_id = job_id
         # extraction_dir already includes job_id, so just append rhcert_attachments
         self.attachments_dir = os.path.join(extraction_dir, 'rhcert_attachments')
+        # Parsed validation reports, keyed by a digest of their contents
+        self.cache_dir = os.path.join(extraction_dir, '.rhcert_parse_cache')
 
-    def parse(self) -> Dict:
+    def parse(self, dir_index: Optional[DirIndex] = None) -> Dict:
         """
         Parse all neutron/cinder/manila test result files from attachments
 
+        Args:
+            dir_index: Optional prebuilt index covering the attachments
+                directory, shared with other parsers to avoid another walk
+
         Returns:
             dict: Aggregated test results from all components
         """
@@ -55,16 +79,17 @@ class RHCertAttachmentParser:
                 return results
 
             # Find all validation_report.json files for neutron/cinder/manila
-            validation_files = self._find_validation_files()
+            validation_files = self._find_validation_files(dir_index)
 
             logger.info(f"Found {len(validation_files)} validation report files")
 
-            for validation_file in validation_files:
-                component_name = self._extract_component_name(validation_file)
-                logger.info(f"Parsing {component_name} validation report")
+            component_names = [self._extract_component_name(f) for f in validation_files]
 
-                component_results = self._parse_validation_file(validation_file, component_name)
+            # Read and decode the reports concurrently; map() keeps file order
+            with ThreadPoolExecutor(max_workers=min(8, len(validation_files) or 1)) as executor:
+                parsed = list(executor.map(self._parse_validation_file, validation_files, component_names))
 
+            for component_name, component_results in zip(component_names, parsed):
                 if component_results:
                     results['components'].append(component_results)
 
@@ -95,37 +120,80 @@ class RHCertAttachmentParser:
             logger.error(f"Error parsing rhcert attachments: {e}")
             raise
 
-    def _find_validation_files(self) -> List[str]:
+    def source_fingerprint(self, dir_index: Optional[DirIndex] = None) -> Optional[Tuple[int, int, int]]:
+        """
+        Identify the current version of the validation reports parse() reads
+
+        Args:
+            dir_index: Optional prebuilt index covering the attachments
+                directory; pass the same one to parse() so both see the same files
+
+        Returns:
+            (file count, newest mtime_ns, total size) of the validation report
+            files, or None if the attachments directory doesn't exist
+        """
+        if not os.path.isdir(self.attachments_dir):
+            return None
+
+        count = newest = total = 0
+        for entry in self._find_validation_entries(dir_index):
+            try:
+                # Cached on the entry, so a shared index stats each report once
+                st = entry.stat()
+            except OSError:
+                continue
+            count += 1
+            newest = max(newest, st.st_mtime_ns)
+            total += st.st_size
+
+        return count, newest, total
+
+    def _find_validation_files(self, dir_index: Optional[DirIndex] = None) -> List[str]:
         """
         Find all validation_report.json files for neutron/cinder/manila
 
+        Args:
+            dir_index: Optional prebuilt index covering the attachments directory
+
         Returns:
             list: Paths to validation report files
         """
-        validation_files = []
+        return [entry.path for entry in self._find_validation_entries(dir_index)]
+
+    def _find_validation_entries(self, dir_index: Optional[DirIndex] = None) -> List[os.DirEntry]:
+        """
+        Find the directory entries of all neutron/cinder/manila validation reports
+
+        Args:
+            dir_index: Optional prebuilt index covering the attachments
+                directory (one is built if not given)
+
+        Returns:
+            list: DirEntry objects of validation report files
+        """
+        validation_entries = []
 
         # Target components
         target_components = ['neutron', 'cinder', 'manila']
 
         try:
             # Search for validation_report.json files
-            for root, dirs, files in os.walk(self.attachments_dir):
-                for file in files:
-                    # Check if it's a validation report file
-                    if file.endswith('-validation_report.json'):
-                        file_lower = file.lower()
-                        # Check if it starts with any target component
-                        for component in target_components:
-                            if file_lower.startswith(component):
-                                full_path = os.path.join(root, file)
-                                validation_files.append(full_path)
-                                logger.info(f"Found validation file: {file}")
-                                break
+            if dir_index is None:
+                dir_index = DirIndex(self.attachments_dir)
+
+            for entry in dir_index.iter_by_suffix('-validation_report.json', under=self.attachments_dir):
+                file_lower = entry.name.lower()
+                # Check if it starts with any target component
+                for component in target_components:
+                    if file_lower.startswith(component):
+                        validation_entries.append(entry)
+                        logger.debug(f"Found validation file: {entry.name}")
+                        break
 
         except Exception as e:
             logger.error(f"Error finding validation files: {e}")
 
-        return validation_files
+        return validation_entries
 
     def _extract_component_name(self, file_path: str) -> str:
         """
@@ -164,9 +232,20 @@ class RHCertAttachmentParser:
             'skipped_tests': []
         }
 
+        logger.info(f"Parsing {component_name} validation report")
+
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+
+            # Reports already parsed in an earlier run are loaded from the cache
+            cache_path = self._cache_path(raw, component_name)
+            cached = self._load_cached_results(cache_path)
+            if cached is not None:
+                logger.info(f"Using cached results for {component_name}")
+                return cached
+
+            data = _json_loads(raw)
 
             # Extract totals
             if 'total' in data:
@@ -220,11 +299,56 @@ class RHCertAttachmentParser:
             logger.info(f"Parsed {component_name}: {component_results['total_tests']} tests, "
                        f"{component_results['failed']} failures")
 
+            self._store_cached_results(cache_path, component_results)
+
         except Exception as e:
             logger.error(f"Error parsing validation file {file_path}: {e}")
 
         return component_results
 
+    def _cache_path(self, raw: bytes, component_name: str) -> str:
+        """
+        Get the parse cache path for a validation report
+
+        Args:
+            raw: Raw report file contents
+            component_name: Component name (part of the parsed results)
+
+        Returns:
+            str: Path of the cache entry
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(_PARSE_CACHE_VERSION + b'\0' + component_name.encode('utf-8') + b'\0')
+        digest.update(raw)
+        return os.path.join(self.cache_dir, f"{digest.hexdigest()}.json")
+
+    def _load_cached_results(self, cache_path: str) -> Optional[Dict]:
+        """Load parsed results from the cache, or None if not cached"""
+        try:
+            with open(cache_path, 'rb') as f:
+                return _json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable parse cache entry {cache_path}: {e}")
+            return None
+
+    def _store_cached_results(self, cache_path: str, component_results: Dict) -> None:
+        """Write parsed results to the cache; failures only cost a re-parse later"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp file and rename so readers never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(_json_dumps(component_results))
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.warning(f"Could not write parse cache entry {cache_path}: {e}")
+
     def _extract_class_name(self, test_name: str) -> str:
         """
         Extract class/module name from full test name
@@ -3,11 +3,18 @@ Red Hat Certification XML Parser
 Parses rhcert-results-*.xml files to extract test results
 """
 
-import xml.etree.ElementTree as ET
 from typing import Dict, List
 from collections import defaultdict
 import logging
 
+try:
+    from lxml import etree as ET
+    # Lift libxml2's depth and text-size limits: <output>/<stderr> can hold large command logs
+    _PARSER_OPTIONS = {'huge_tree': True}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _PARSER_OPTIONS = {}
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,9 +32,6 @@ class RHCertXMLParser:
             dict: Parsed test results with statistics and failures
         """
         try:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-
             results = {
                 'total_tests': 0,
                 'passed': 0,
@@ -42,8 +46,44 @@ class RHCertXMLParser:
                 'test_components': []
             }
 
+            certifications = []
+            vendors = []
+            open_tests = []
+            # Open elements, so finished tests can be detached from their parent
+            stack = []
+
+            # Per-tag handlers; everything is collected in the one pass below
+            start_handlers = {
+                'certification': certifications.append,
+                'vendor': vendors.append,
+                'plan-component': lambda elem: results['test_components'].append(self._parse_component(elem)),
+                'test': open_tests.append,
+            }
+
+            # Stream the document: each <run> is counted as soon as it is
+            # complete and its subtree freed, so a passing run costs no more
+            # than a counter bump; finished tests are dropped entirely
+            for event, elem in ET.iterparse(xml_file_path, events=('start', 'end'), **_PARSER_OPTIONS):
+                if event == 'start':
+                    stack.append(elem)
+                    handler = start_handlers.get(elem.tag)
+                    if handler is not None:
+                        handler(elem)
+                    continue
+
+                stack.pop()
+                if elem.tag == 'run':
+                    if open_tests:
+                        self._parse_run(open_tests[-1], elem, results)
+                        elem.clear()
+                elif elem.tag == 'test':
+                    open_tests.pop()
+                    elem.clear()
+                    if stack:
+                        stack[-1].remove(elem)
+
             # Extract certification metadata
-            cert = root.find('.//certification')
+            cert = certifications[0] if certifications else None
             if cert is not None:
                 results['certification_info'] = {
                     'id': cert.get('id', 'Unknown'),
@@ -55,7 +95,9 @@ class RHCertXMLParser:
                 }
 
             # Extract product information
-            vendor = root.find('.//vendor[@id="569359"]') or root.find('.//vendor')
+            vendor = next((v for v in vendors if v.get('id') == '569359' and len(v)), None)
+            if vendor is None and vendors:
+                vendor = vendors[0]
             if vendor is not None:
                 product = vendor.find('product')
                 results['product_info'] = {
@@ -65,7 +107,7 @@ class RHCertXMLParser:
                 }
 
             # Get Red Hat platform info
-            rh_vendor = root.find('.//vendor[@name="Red Hat, Inc."]')
+            rh_vendor = next((v for v in vendors if v.get('name') == 'Red Hat, Inc.'), None)
             if rh_vendor is not None:
                 rh_product = rh_vendor.find('.//product')
                 version = rh_product.find('version') if rh_product is not None else None
@@ -76,61 +118,6 @@ class RHCertXMLParser:
                         'platform': version.get('platform', 'Unknown') if version is not None else 'Unknown'
                     }
 
-            # Parse all test components
-            components = root.findall('.//plan-component')
-            for comp in components:
-                results['test_components'].append({
-                    'id': comp.get('id', ''),
-                    'name': comp.get('name', ''),
-                    'bits': comp.get('bits', '')
-                })
-
-            # Parse all test executions
-            tests = root.findall('.//test')
-            for test in tests:
-                test_name = test.get('name', 'Unknown')
-                test_path = test.get('path', '')
-                component_id = test.get('component-id', '')
-
-                # Find test run
-                runs = test.findall('.//run')
-                for run in runs:
-                    results['total_tests'] += 1
-
-                    summary = run.find('summary')
-                    if summary is not None:
-                        result_status = summary.get('data-value', 'UNKNOWN').upper()
-                        summary_text = summary.text.strip() if summary.text else ''
-
-                        run_time = run.get('run-time', 'N/A')
-                        end_time = run.get('end-time', 'N/A')
-                        return_value = run.get('return-value', '')
-
-                        # Categorize result
-                        if result_status == 'PASS':
-                            results['passed'] += 1
-                        elif result_status == 'FAIL':
-                            results['failed'] += 1
-                            # Extract failure details
-                            self._parse_failure(test, test_name, test_path, run, run_time, end_time, results)
-                        elif result_status == 'REVIEW':
-                            results['review'] += 1
-                            # Add to failures for visibility
-                            results['failures'].append({
-                                'test_name': test_name,
-                                'class_name': test_path,
-                                'error_message': f'Test requires manual review: {summary_text}',
-                                'traceback': '',
-                                'failure_type': 'review',
-                                'duration': 0.0,
-                                'run_time': run_time,
-                                'end_time': end_time
-                            })
-                        elif result_status == 'SKIP':
-                            results['skipped'] += 1
-                        else:
-                            results['errors'] += 1
-
             logger.info(f"Parsed rhcert XML: total={results['total_tests']}, passed={results['passed']}, "
                        f"failed={results['failed']}, review={results['review']}, skipped={results['skipped']}")
 
@@ -143,6 +130,58 @@ class RHCertXMLParser:
             logger.error(f"Unexpected error parsing rhcert XML: {e}")
             raise
 
+    def _parse_component(self, comp: ET.Element) -> Dict:
+        """Extract test component information"""
+        return {
+            'id': comp.get('id', ''),
+            'name': comp.get('name', ''),
+            'bits': comp.get('bits', '')
+        }
+
+    def _parse_run(self, test: ET.Element, run: ET.Element, results: Dict):
+        """Count a single test run and record it if it did not pass"""
+
+        results['total_tests'] += 1
+
+        summary = run.find('summary')
+        if summary is not None:
+            result_status = summary.get('data-value', 'UNKNOWN').upper()
+
+            # Passing runs only need counting
+            if result_status == 'PASS':
+                results['passed'] += 1
+                return
+
+            test_name = test.get('name', 'Unknown')
+            test_path = test.get('path', '')
+            summary_text = summary.text.strip() if summary.text else ''
+
+            run_time = run.get('run-time', 'N/A')
+            end_time = run.get('end-time', 'N/A')
+
+            # Categorize result
+            if result_status == 'FAIL':
+                results['failed'] += 1
+                # Extract failure details
+                self._parse_failure(test, test_name, test_path, run, run_time, end_time, results)
+            elif result_status == 'REVIEW':
+                results['review'] += 1
+                # Add to failures for visibility
+                results['failures'].append({
+                    'test_name': test_name,
+                    'class_name': test_path,
+                    'error_message': f'Test requires manual review: {summary_text}',
+                    'traceback': '',
+                    'failure_type': 'review',
+                    'duration': 0.0,
+                    'run_time': run_time,
+                    'end_time': end_time
+                })
+            elif result_status == 'SKIP':
+                results['skipped'] += 1
+            else:
+                results['errors'] += 1
+
     def _parse_failure(self, test: ET.Element, test_name: str, test_path: str,
                       run: ET.Element, run_time: str, end_time: str, results: Dict):
         """Extract detailed failure information"""
@@ -154,7 +193,7 @@ class RHCertXMLParser:
         output = run.find('.//output')
         if output is not None and output.text:
             output_text = output.text.strip()
-            lines = output_text.split('\n')
+            lines = output_text.splitlines()
 
             # Look for error lines
             for line in lines:
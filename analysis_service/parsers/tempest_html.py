@@ -3,17 +3,176 @@ Tempest HTML Parser
 Parses tempest_results.html files to extract test results
 """
 
-from bs4 import BeautifulSoup
-from typing import Dict, List
+from lxml import etree, html
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 import re
 import logging
+import os
+import sys
 
 logger = logging.getLogger(__name__)
 
+# Text inside these elements is not rendered content and is left out of get_text()
+_NON_TEXT_TAGS = ('script', 'style', 'template')
+_PRESERVE_WHITESPACE_TAGS = ('pre', 'textarea')
+_ASCII_SPACES = ' \n\t\f\r'
+
+_NUM_RE = re.compile(r'\d+')
+_STATS_RE = re.compile(r'(\d+)\s*(test|pass|fail|error|skip)', re.IGNORECASE)
+_TESTNAME_RE = re.compile(r'(test_\w+)')
+_FAIL_RE = re.compile(r'FAILED|ERROR')
+_MARKER_RE = re.compile(r'FAILED|ERROR|Traceback')
+
+# Text fallback scans the document in blocks of about this many characters
+_TEXT_BLOCK_SIZE = 1024 * 1024
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching an element whose class attribute contains the given class token"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath queries are compiled once and reused for every report
+_XP_SUMMARY_TABLE = etree.XPath(f"//table[{_has_class('summary')}]")
+_XP_STATS_DIV = etree.XPath(f"//div[{_has_class('statistics')}]")
+_XP_STATS_ID_DIV = etree.XPath("//div[@id='stats']")
+_XP_RESULTS_TABLE = etree.XPath(f"//table[{_has_class('results')}]")
+_XP_RESULTS_ID_TABLE = etree.XPath("//table[@id='results-table']")
+_XP_RESULT_ROWS = etree.XPath(
+    f".//tr[{_has_class('failed')} or {_has_class('error')} or {_has_class('failure')}]"
+)
+_XP_FAIL_DIVS = etree.XPath(
+    f"//div[{_has_class('test-failure')} or {_has_class('test-error')} or {_has_class('failure')}]"
+)
+_XP_ROWS = etree.XPath('.//tr')
+_XP_CELLS = etree.XPath('.//td')
+
+# Failure fields: an element carrying the field's class, else a fallback
+# element (a table cell with the given class, or <pre> for the traceback)
+_FIELD_CLASSES = {
+    'test-name': 'test_name',
+    'test-class': 'class_name',
+    'error-message': 'error_message',
+    'traceback': 'traceback',
+}
+_FIELD_CELL_CLASSES = {
+    'name': 'test_name',
+    'class': 'class_name',
+    'message': 'error_message',
+}
+
+
+def _iter_strings(element, preserve: bool = False):
+    """
+    Yield (text, preserve_whitespace) for each text fragment under an element, in document order
+
+    Comments, processing instructions and _NON_TEXT_TAGS elements contribute
+    only their tail, as a fragment of its own.
+    """
+    if element.text:
+        yield element.text, preserve
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+            yield from _iter_strings(child, preserve or child.tag in _PRESERVE_WHITESPACE_TAGS)
+        if child.tail:
+            yield child.tail, preserve
+
+
+def _iter_text(element):
+    """
+    Yield the text fragments of an element and its descendants, in document order
+
+    Whitespace-only fragments outside <pre> collapse to a single newline or
+    space, matching how the reports have always been read.
+    """
+    for text, preserve in _iter_strings(element, element.tag in _PRESERVE_WHITESPACE_TAGS):
+        if not preserve and not text.strip(_ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        yield text
+
+
+def _iter_line_blocks(element):
+    """
+    Yield the text content of an element as blocks of whole lines
+
+    Blocks are cut at newlines, which are dropped, so the lines of all
+    blocks (block.split('\\n')) are the lines of the full text, without
+    ever joining that text into one string.
+    """
+    pending = []
+    pending_size = 0
+    for text in _iter_text(element):
+        pending.append(text)
+        pending_size += len(text)
+        if pending_size < _TEXT_BLOCK_SIZE:
+            continue
+
+        text = ''.join(pending)
+        cut = text.rfind('\n')
+        if cut == -1:
+            pending = [text]
+            continue
+
+        yield text[:cut]
+        pending = [text[cut + 1:]]
+        pending_size = len(pending[0])
+
+    yield ''.join(pending)
+
+
+def _get_text(element, strip: bool = False) -> str:
+    """
+    Concatenate the text content of an element and its descendants
+
+    Args:
+        element: lxml element
+        strip: Strip whitespace from each text fragment before joining
+
+    Returns:
+        str: Text content
+    """
+    if strip:
+        return ''.join(text.strip() for text, _ in _iter_strings(element))
+    return ''.join(_iter_text(element))
+
+
+def _first(element, *xpaths):
+    """Return the first node matched by the first XPath that matches anything, or None"""
+    for xpath in xpaths:
+        matches = xpath(element)
+        if matches:
+            return matches[0]
+    return None
+
 
 class TempestHTMLParser:
     """Parser for tempest HTML result files"""
 
+    @classmethod
+    def parse_many(cls, paths: List[str], max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Parse several tempest HTML results files in parallel
+
+        Each file is parsed in a separate worker process, so the parsing
+        work is spread across CPU cores instead of sharing one GIL.
+
+        Args:
+            paths: Paths to tempest HTML results files
+            max_workers: Maximum worker processes (defaults to the CPU count)
+
+        Returns:
+            list: Parsed results, in the same order as paths
+        """
+        if len(paths) <= 1:
+            return [cls().parse(path) for path in paths]
+
+        max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+        # Hand out several files per task to amortize the inter-process round trips
+        chunksize = max(1, len(paths) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_parse_file, paths, chunksize=chunksize))
+
     def parse(self, html_file_path: str) -> Dict:
         """
         Parse tempest HTML results file
@@ -25,10 +184,13 @@ class TempestHTMLParser:
             dict: Parsed test results with statistics and failures
         """
         try:
-            with open(html_file_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-
-            soup = BeautifulSoup(html_content, 'lxml')
+            # libxml2 reads the file itself, so the report is never held as a
+            # Python bytes or str object; the parser decodes it as UTF-8.
+            # huge_tree keeps libxml2 from dropping text nodes over 10 MB
+            parser = html.HTMLParser(encoding='utf-8', huge_tree=True)
+            root = etree.parse(html_file_path, parser).getroot()
+            if root is None:
+                root = html.Element('html')
 
             results = {
                 'total_tests': 0,
@@ -41,10 +203,10 @@ class TempestHTMLParser:
             }
 
             # Try to find summary statistics
-            self._parse_summary(soup, results)
+            self._parse_summary(root, results)
 
             # Parse individual test results
-            self._parse_test_results(soup, results)
+            self._parse_test_results(root, results)
 
             logger.info(f"Parsed HTML: {results['total_tests']} total, {results['failed']} failed")
 
@@ -54,19 +216,19 @@ class TempestHTMLParser:
             logger.error(f"Error parsing HTML: {e}")
             raise
 
-    def _parse_summary(self, soup: BeautifulSoup, results: Dict):
+    def _parse_summary(self, root, results: Dict):
         """Parse summary statistics from HTML"""
 
         # Look for common patterns in tempest HTML output
         # Pattern 1: Summary table
-        summary_table = soup.find('table', class_='summary')
-        if summary_table:
-            rows = summary_table.find_all('tr')
+        summary_table = _first(root, _XP_SUMMARY_TABLE)
+        if summary_table is not None:
+            rows = _XP_ROWS(summary_table)
             for row in rows:
-                cells = row.find_all('td')
+                cells = _XP_CELLS(row)
                 if len(cells) >= 2:
-                    label = cells[0].get_text(strip=True).lower()
-                    value_text = cells[1].get_text(strip=True)
+                    label = _get_text(cells[0], strip=True).lower()
+                    value_text = _get_text(cells[1], strip=True)
                     value = self._extract_number(value_text)
 
                     if 'total' in label:
@@ -83,11 +245,11 @@ class TempestHTMLParser:
                         results['duration'] = float(value_text.replace('s', '').strip() if 's' in value_text else value)
 
         # Pattern 2: Metadata/stats divs
-        stats_div = soup.find('div', class_='statistics') or soup.find('div', id='stats')
-        if stats_div and not summary_table:
-            text = stats_div.get_text()
+        stats_div = _first(root, _XP_STATS_DIV, _XP_STATS_ID_DIV)
+        if stats_div is not None and summary_table is None:
+            text = _get_text(stats_div)
             # Extract numbers from text
-            matches = re.findall(r'(\d+)\s*(test|pass|fail|error|skip)', text, re.IGNORECASE)
+            matches = _STATS_RE.findall(text)
             for value, label in matches:
                 value = int(value)
                 label = label.lower()
@@ -102,20 +264,20 @@ class TempestHTMLParser:
                 elif 'skip' in label:
                     results['skipped'] = value
 
-    def _parse_test_results(self, soup: BeautifulSoup, results: Dict):
+    def _parse_test_results(self, root, results: Dict):
         """Parse individual test case results"""
 
         # Look for test result tables or divs
         test_rows = []
 
         # Pattern 1: Table with test results
-        results_table = soup.find('table', class_='results') or soup.find('table', id='results-table')
-        if results_table:
-            test_rows = results_table.find_all('tr', class_=['failed', 'error', 'failure'])
+        results_table = _first(root, _XP_RESULTS_TABLE, _XP_RESULTS_ID_TABLE)
+        if results_table is not None:
+            test_rows = _XP_RESULT_ROWS(results_table)
 
         # Pattern 2: Divs with test results
         if not test_rows:
-            test_rows = soup.find_all('div', class_=['test-failure', 'test-error', 'failure'])
+            test_rows = _XP_FAIL_DIVS(root)
 
         for row in test_rows:
             failure = self._parse_failure_row(row)
@@ -124,9 +286,9 @@ class TempestHTMLParser:
 
         # If we didn't find failures via tables/divs, try plain text parsing
         if not results['failures'] and (results['failed'] > 0 or results['errors'] > 0):
-            self._parse_failures_from_text(soup, results)
+            self._parse_failures_from_text(root, results)
 
-    def _parse_failure_row(self, element) -> Dict:
+    def _parse_failure_row(self, element) -> Optional[Dict]:
         """Parse a single failure row/div"""
 
         failure = {
@@ -138,28 +300,43 @@ class TempestHTMLParser:
             'duration': 0.0
         }
 
-        # Try to extract test name
-        name_elem = element.find(class_='test-name') or element.find('td', class_='name')
-        if name_elem:
-            failure['test_name'] = name_elem.get_text(strip=True)
-
-        # Try to extract class name
-        class_elem = element.find(class_='test-class') or element.find('td', class_='class')
-        if class_elem:
-            failure['class_name'] = class_elem.get_text(strip=True)
-
-        # Try to extract error message
-        error_elem = element.find(class_='error-message') or element.find('td', class_='message')
-        if error_elem:
-            failure['error_message'] = error_elem.get_text(strip=True)
-
-        # Try to extract traceback
-        tb_elem = element.find(class_='traceback') or element.find('pre')
-        if tb_elem:
-            failure['traceback'] = tb_elem.get_text(strip=True)
+        # Find every field in one walk over the row: the first element with
+        # the field's class wins, and a fallback element is used only when
+        # no such element exists
+        found = {}
+        fallback = {}
+        for child in element.iterdescendants('*'):
+            classes = child.get('class')
+            tokens = classes.split() if classes else ()
+
+            for token in tokens:
+                field = _FIELD_CLASSES.get(token)
+                if field is not None and field not in found:
+                    found[field] = child
+
+            if child.tag == 'td':
+                for token in tokens:
+                    field = _FIELD_CELL_CLASSES.get(token)
+                    if field is not None and field not in fallback:
+                        fallback[field] = child
+            elif child.tag == 'pre' and 'traceback' not in fallback:
+                fallback['traceback'] = child
+
+            if len(found) == len(_FIELD_CLASSES):
+                break
+
+        for field in _FIELD_CLASSES.values():
+            field_elem = found.get(field)
+            if field_elem is None:
+                field_elem = fallback.get(field)
+            if field_elem is not None:
+                failure[field] = _get_text(field_elem, strip=True)
+
+        # Many failures share a handful of classes; share one string per class
+        failure['class_name'] = sys.intern(failure['class_name'])
 
         # Determine failure type from class
-        classes = element.get('class', [])
+        classes = (element.get('class') or '').split()
         if 'error' in classes:
             failure['failure_type'] = 'error'
         elif 'skip' in classes:
@@ -167,41 +344,68 @@ class TempestHTMLParser:
 
         return failure if failure['test_name'] != 'Unknown' else None
 
-    def _parse_failures_from_text(self, soup: BeautifulSoup, results: Dict):
+    def _parse_failures_from_text(self, root, results: Dict):
         """Fallback: parse failures from plain text content"""
 
-        # Look for sections marked as failures
-        text = soup.get_text()
-        lines = text.split('\n')
-
+        # Look for sections marked as failures. Almost no line carries a
+        # marker, so the regex engine jumps from one marker to the next and
+        # only those lines reach Python; traceback bodies are taken in bulk
+        # up to the next failure marker
         current_failure = None
         in_traceback = False
 
-        for line in lines:
-            line = line.strip()
-
-            # Detect test failure markers
-            if 'FAILED' in line or 'ERROR' in line:
-                if current_failure:
-                    results['failures'].append(current_failure)
-
-                # Extract test name
-                match = re.search(r'(test_\w+)', line)
-                test_name = match.group(1) if match else 'Unknown'
-
-                current_failure = {
-                    'test_name': test_name,
-                    'class_name': 'Unknown',
-                    'error_message': line,
-                    'traceback': '',
-                    'failure_type': 'error' if 'ERROR' in line else 'failure',
-                    'duration': 0.0
-                }
-                in_traceback = False
-
-            elif current_failure and ('Traceback' in line or in_traceback):
-                in_traceback = True
-                current_failure['traceback'] += line + '\n'
+        for block in _iter_line_blocks(root):
+            pos = 0
+            end = len(block)
+
+            while pos <= end:
+                if in_traceback:
+                    match = _FAIL_RE.search(block, pos)
+                    line_start = block.rfind('\n', pos, match.start()) + 1 if match else end + 1
+                    if line_start == 0:
+                        line_start = pos
+                    if line_start > pos:
+                        lines = block[pos:line_start - 1].split('\n')
+                        current_failure['traceback'] += ''.join(line.strip() + '\n' for line in lines)
+                    if not match:
+                        break
+                else:
+                    marker_re = _MARKER_RE if current_failure else _FAIL_RE
+                    match = marker_re.search(block, pos)
+                    if not match:
+                        break
+                    line_start = block.rfind('\n', pos, match.start()) + 1
+                    if line_start == 0:
+                        line_start = pos
+
+                line_end = block.find('\n', line_start)
+                if line_end == -1:
+                    line_end = end
+                line = block[line_start:line_end].strip()
+                pos = line_end + 1
+
+                # Detect test failure markers
+                if _FAIL_RE.search(line):
+                    if current_failure:
+                        results['failures'].append(current_failure)
+
+                    # Extract test name
+                    match = _TESTNAME_RE.search(line)
+                    test_name = match.group(1) if match else 'Unknown'
+
+                    current_failure = {
+                        'test_name': test_name,
+                        'class_name': 'Unknown',
+                        'error_message': line,
+                        'traceback': '',
+                        'failure_type': 'error' if 'ERROR' in line else 'failure',
+                        'duration': 0.0
+                    }
+                    in_traceback = False
+
+                elif current_failure and ('Traceback' in line or in_traceback):
+                    in_traceback = True
+                    current_failure['traceback'] += line + '\n'
 
         # Add last failure
         if current_failure:
@@ -209,5 +413,10 @@ class TempestHTMLParser:
 
     def _extract_number(self, text: str) -> int:
         """Extract first number from text"""
-        match = re.search(r'\d+', text)
+        match = _NUM_RE.search(text)
         return int(match.group()) if match else 0
+
+
+def _parse_file(html_file_path: str) -> Dict:
+    """Parse one tempest HTML results file (module level so worker processes can unpickle it)"""
+    return TempestHTMLParser().parse(html_file_path)
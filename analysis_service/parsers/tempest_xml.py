@@ -3,16 +3,142 @@ Tempest XML Parser
 Parses tempest_results.xml files to extract test results
 """
 
-import xml.etree.ElementTree as ET
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
 import logging
+import os
+import sys
+
+try:
+    from lxml import etree as ET
+    # Lift libxml2's depth and text-size limits for very large reports
+    _PARSER_OPTIONS = {'huge_tree': True}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _PARSER_OPTIONS = {}
 
 logger = logging.getLogger(__name__)
 
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Testcase outcome children in precedence order: (tag, results counter, failure type)
+_OUTCOMES = (
+    ('failure', 'failed', 'failure'),
+    ('error', 'errors', 'error'),
+    ('skipped', 'skipped', 'skip'),
+)
+
+
+class _JUnitTarget:
+    """
+    Parser target that tallies JUnit testcases from start/data/end events
+
+    No element tree is built: the attributes of the open testcase and of
+    its first failure/error/skipped children are all that is kept.
+    """
+
+    _OUTCOME_TAGS = frozenset(tag for tag, _, _ in _OUTCOMES)
+
+    def __init__(self, parse_testcase):
+        self.results = {
+            'total_tests': 0,
+            'passed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'errors': 0,
+            'duration': 0.0,
+            'failures': []
+        }
+        self._parse_testcase = parse_testcase
+        self._depth = 0
+        self._root_tag = None
+        # Depth and attributes of the testsuite whose testcases are counted:
+        # the root <testsuite>, or a direct child of a root <testsuites>
+        self._suite_depth = None
+        self._suite_attrib = None
+        self._case_attrib = None
+        self._outcomes = {}
+        # Text of the open outcome element, collected until its first child
+        self._text = None
+
+    def start(self, tag, attrib):
+        depth = self._depth
+        self._depth += 1
+        self._text = None
+
+        if depth == 0:
+            self._root_tag = tag
+            if tag == 'testsuite':
+                self._suite_depth, self._suite_attrib = depth, attrib
+        elif self._suite_depth is None:
+            if depth == 1 and self._root_tag == 'testsuites' and tag == 'testsuite':
+                self._suite_depth, self._suite_attrib = depth, attrib
+        elif depth == self._suite_depth + 1:
+            if tag == 'testcase':
+                self._case_attrib = attrib
+                if self._outcomes:
+                    self._outcomes = {}
+        elif (depth == self._suite_depth + 2 and self._case_attrib is not None
+              and tag in self._OUTCOME_TAGS and tag not in self._outcomes):
+            self._text = []
+            self._outcomes[tag] = (attrib, self._text)
+
+    def data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def end(self, tag):
+        self._depth -= 1
+        self._text = None
+
+        if self._suite_depth is None:
+            return
+        if self._depth == self._suite_depth + 1:
+            if self._case_attrib is not None:
+                if self._outcomes:
+                    self._parse_testcase(self._case_attrib, self._outcomes, self.results)
+                else:
+                    # Passing testcase: nothing to record, though its time
+                    # must still be a valid number as for any other testcase
+                    float(self._case_attrib.get('time', 0.0))
+                # Total tests is the count of all testcases found
+                self.results['total_tests'] += 1
+                self._case_attrib = None
+        elif self._depth == self._suite_depth:
+            self.results['duration'] += float(self._suite_attrib.get('time', 0.0))
+            self._suite_depth = self._suite_attrib = None
+
+    def close(self):
+        return self.results
+
 
 class TempestXMLParser:
     """Parser for tempest XML result files"""
 
+    @classmethod
+    def parse_many(cls, paths: List[str], max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Parse several tempest XML results files in parallel
+
+        Each file is parsed in a separate worker process, so the parsing
+        work is spread across CPU cores instead of sharing one GIL.
+
+        Args:
+            paths: Paths to tempest XML results files
+            max_workers: Maximum worker processes (defaults to the CPU count)
+
+        Returns:
+            list: Parsed results, in the same order as paths
+        """
+        if len(paths) <= 1:
+            return [cls().parse(path) for path in paths]
+
+        max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+        # Hand out several files per task to amortize the inter-process round trips
+        chunksize = max(1, len(paths) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_parse_file, paths, chunksize=chunksize))
+
     def parse(self, xml_file_path: str) -> Dict:
         """
         Parse tempest XML results file
@@ -24,27 +150,13 @@ class TempestXMLParser:
             dict: Parsed test results with statistics and failures
         """
         try:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-
-            results = {
-                'total_tests': 0,
-                'passed': 0,
-                'failed': 0,
-                'skipped': 0,
-                'errors': 0,
-                'duration': 0.0,
-                'failures': []
-            }
-
-            # Parse testsuite element (JUnit XML format)
-            if root.tag == 'testsuites':
-                # Multiple test suites
-                for testsuite in root.findall('testsuite'):
-                    self._parse_testsuite(testsuite, results)
-            elif root.tag == 'testsuite':
-                # Single test suite
-                self._parse_testsuite(root, results)
+            # Parse testsuite elements (JUnit XML format) straight from the
+            # parser events; memory stays flat however many testcases there are
+            parser = ET.XMLParser(target=_JUnitTarget(self._parse_testcase), **_PARSER_OPTIONS)
+            with open(xml_file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(_READ_CHUNK_SIZE), b''):
+                    parser.feed(chunk)
+            results = parser.close()
 
             # Calculate passed count (tests that didn't fail, error, or get skipped)
             results['passed'] = results['total_tests'] - results['failed'] - results['skipped'] - results['errors']
@@ -65,86 +177,56 @@ class TempestXMLParser:
             logger.error(f"Unexpected error parsing XML: {e}")
             raise
 
-    def _parse_testsuite(self, testsuite: ET.Element, results: Dict):
-        """Parse a single testsuite element"""
-
-        # Get duration from testsuite
-        time = float(testsuite.get('time', 0.0))
-        results['duration'] += time
-
-        # Count actual test cases (more accurate than testsuite attributes)
-        # Parse individual test cases and count them
-        for testcase in testsuite.findall('testcase'):
-            self._parse_testcase(testcase, results)
-            # Total tests is the count of all testcases found
-            results['total_tests'] += 1
-
-    def _parse_testcase(self, testcase: ET.Element, results: Dict):
-        """Parse a single testcase element"""
-
-        test_name = testcase.get('name', 'Unknown')
-        class_name = testcase.get('classname', 'Unknown')
-        time = float(testcase.get('time', 0.0))
-
-        # Check for failure
-        failure = testcase.find('failure')
-        if failure is not None:
-            results['failed'] += 1
-            error_message = failure.get('message', '')
-            traceback = failure.text or ''
-            failure_type = failure.get('type', 'failure')
+    def _parse_testcase(self, attrib: Dict, outcomes: Dict, results: Dict):
+        """
+        Record a single testcase
 
-            results['failures'].append({
-                'test_name': test_name,
-                'class_name': class_name,
-                'error_message': error_message,
-                'traceback': traceback,
-                'failure_type': 'failure',
-                'duration': time
-            })
-            return  # Don't count as passed
+        Args:
+            attrib: Attributes of the testcase element
+            outcomes: First failure/error/skipped child by tag, as (attributes, text fragments)
+            results: Results being accumulated
+        """
 
-        # Check for error
-        error = testcase.find('error')
-        if error is not None:
-            results['errors'] += 1
-            error_message = error.get('message', '')
-            traceback = error.text or ''
-            error_type = error.get('type', 'error')
+        test_name = attrib.get('name', 'Unknown')
+        # A suite has thousands of testcases but few classes; share one string per class
+        class_name = sys.intern(attrib.get('classname', 'Unknown'))
+        time = float(attrib.get('time', 0.0))
+
+        # The first outcome present, in precedence order, decides the result
+        for tag, counter, failure_type in _OUTCOMES:
+            outcome = outcomes.get(tag)
+            if outcome is None:
+                continue
+
+            outcome_attrib, outcome_text = outcome
+            results[counter] += 1
+            error_message = outcome_attrib.get('message', '')
+
+            if failure_type == 'skip':
+                # Skip reason can be in 'message' attribute OR in the text content
+                if not error_message:
+                    error_message = ''.join(outcome_text).strip()
+
+                # If still no message, provide a default
+                if not error_message:
+                    error_message = 'Test skipped (no reason provided)'
+                traceback = ''
+            else:
+                traceback = ''.join(outcome_text)
 
             results['failures'].append({
                 'test_name': test_name,
                 'class_name': class_name,
                 'error_message': error_message,
                 'traceback': traceback,
-                'failure_type': 'error',
+                'failure_type': failure_type,
                 'duration': time
             })
             return  # Don't count as passed
 
-        # Check for skip
-        skipped = testcase.find('skipped')
-        if skipped is not None:
-            results['skipped'] += 1
-            # Skip reason can be in 'message' attribute OR in the text content
-            skip_message = skipped.get('message', '')
-
-            # If no message attribute, get text content between <skipped></skipped> tags
-            if not skip_message and skipped.text:
-                skip_message = skipped.text.strip()
+        # If we get here, the test passed (no failure, error, or skip)
 
-            # If still no message, provide a default
-            if not skip_message:
-                skip_message = 'Test skipped (no reason provided)'
 
-            results['failures'].append({
-                'test_name': test_name,
-                'class_name': class_name,
-                'error_message': skip_message,
-                'traceback': '',
-                'failure_type': 'skip',
-                'duration': time
-            })
-            return  # Don't count as passed
-
-        # If we get here, the test passed (no failure, error, or skip)
+def _parse_file(xml_file_path: str) -> Dict:
+    """Parse one tempest XML results file (module level so worker processes can unpickle it)"""
+    return TempestXMLParser().parse(xml_file_path)
@@ -4,14 +4,71 @@ Abstract base class for all AI backend plugins
 """
 
 from abc import ABC, abstractmethod
-from typing import AsyncIterator, Dict, List, Optional, Union
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
+import asyncio
+import copy
 import logging
+import random
+import re
+import sys
 
-logger = logging.getLogger(__name__)
+try:
+    import orjson
+
+    def _dataclass_to_json(obj) -> bytes:
+        # orjson serializes dataclasses straight from their fields, with no intermediate dict
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    import json
+
+    def _dataclass_to_json(obj) -> bytes:
+        return json.dumps(obj.to_dict()).encode('utf-8')
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+# __slots__ dataclasses (no per-instance __dict__) need Python 3.10+
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Rendered prompt sections kept for repeated analyze/chat calls on the same results
+_PROMPT_CACHE_SIZE = 256
+
+# Line endings other than \n, and trailing blanks on a line: both vary with the
+# source of a message or log without changing its meaning
+_LINE_ENDING_RE = re.compile(r'\r\n?')
+_TRAILING_BLANKS_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+
+# Streamed tokens are forwarded in batches of up to this many tokens...
+_STREAM_BATCH_TOKENS = 50
+# ...or whatever has arrived once the oldest buffered token is this old (seconds)
+_STREAM_BATCH_DELAY = 0.05
+
+# Seconds a complete (non-streaming) request may take, or a stream may go without
+# output; None (the default) leaves requests to the SDK's own timeout. Long
+# generations and thinking phases routinely pass a minute, so this is opt-in
+DEFAULT_REQUEST_TIMEOUT: Optional[float] = None
+# Retries after a timed-out request, with jittered exponential backoff from this base (seconds)
+_REQUEST_RETRIES = 2
+_RETRY_BACKOFF = 0.5
+
+# Chat history sent with each turn is capped at roughly this many tokens...
+_HISTORY_TOKEN_BUDGET = 6000
+# ...but the most recent messages are always kept
+_HISTORY_MIN_MESSAGES = 8
+# Rough token estimate for English text and logs
+_CHARS_PER_TOKEN = 4
+
+# Responses longer than this are parsed on a worker thread, so parsing a large
+# analysis doesn't stall other requests' streams on the event loop
+_OFFLOAD_PARSE_CHARS = 4096
+# Parsing is short and mostly holds the GIL; a couple of threads is enough
+_PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='response-parse')
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class AnalysisContext:
     """Context provided to AI for analysis"""
     test_failures: List[Dict]
@@ -28,8 +85,12 @@ class AnalysisContext:
             'must_gather_info': self.must_gather_info
         }
 
+    def to_json(self) -> bytes:
+        """Serialize to UTF-8 encoded JSON (same content as to_dict)"""
+        return _dataclass_to_json(self)
+
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class AnalysisResult:
     """Result from AI analysis"""
     summary: str
@@ -48,13 +109,53 @@ class AnalysisResult:
             'confidence': self.confidence
         }
 
+    def to_json(self) -> bytes:
+        """Serialize to UTF-8 encoded JSON (same content as to_dict)"""
+        return _dataclass_to_json(self)
+
 
 class AIBackendPlugin(ABC):
     """Abstract base class for AI backend plugins"""
 
+    # Prompt skeletons are built once; only the per-request fields are substituted
+    _SYSTEM_PROMPT_TEMPLATE = """You are an expert OpenStack test failure analyzer. You help developers understand why tempest tests fail.
+
+Test Summary:
+- Total Tests: {total_tests}
+- Failed: {failed}
+- Errors: {errors}
+- Skipped: {skipped}
+
+Your task is to:
+1. Analyze the test failures and error messages
+2. Correlate failures with must-gather logs when available
+3. Identify root causes
+4. Suggest concrete solutions
+
+Be concise, technical, and actionable. Focus on the "why" and "how to fix"."""
+    _SUMMARY_DEFAULTS = {'total_tests': 0, 'failed': 0, 'errors': 0, 'skipped': 0}
+
+    _FAILURE_TEMPLATE = (
+        "Test: {test_name}\n"
+        "   Class: {class_name}\n"
+        "   Type: {failure_type}\n"
+        "   Error: {error_message}\n"
+    )
+    _FAILURE_DEFAULTS = {
+        'test_name': 'Unknown',
+        'class_name': 'Unknown',
+        'failure_type': 'failure',
+        'error_message': 'No message'
+    }
+
     def __init__(self):
         self.initialized = False
         self.config = {}
+        self.request_timeout = DEFAULT_REQUEST_TIMEOUT
+        # Timed-out requests so far, for tuning request_timeout
+        self.timeouts = 0
+        # Complete requests being served, by request key (see _single_flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
 
     @property
     @abstractmethod
@@ -133,33 +234,222 @@ class AIBackendPlugin(ABC):
         """
         return self.initialized
 
-    def _build_system_prompt(self, context: AnalysisContext) -> str:
+    async def cleanup(self) -> None:
+        """Release resources held by the plugin (connections, sessions)"""
+        pass
+
+    async def _single_flight(self, key: str, make_request: Callable[[], Awaitable]) -> Any:
         """
-        Build system prompt for AI model
+        Share one backend request among concurrent identical requests
+
+        The first caller for a key starts the request; callers arriving
+        while it runs wait for the same result (as their own copy) instead
+        of sending a duplicate. The request runs as a task, so one caller
+        going away doesn't cancel it for the others.
 
         Args:
-            context: Analysis context
+            key: Identifies the request (e.g. ResponseCache.make_key of its inputs)
+            make_request: Returns the request coroutine, called only by the first caller
 
         Returns:
-            str: System prompt
+            The request's result
         """
-        prompt = f"""You are an expert OpenStack test failure analyzer. You help developers understand why tempest tests fail.
+        task = self._inflight.get(key)
+        if task is not None:
+            logger.debug(f"{self.name} joining in-flight request {key[:12]}")
+            return copy.deepcopy(await asyncio.shield(task))
 
-Test Summary:
-- Total Tests: {context.test_summary.get('total_tests', 0)}
-- Failed: {context.test_summary.get('failed', 0)}
-- Errors: {context.test_summary.get('errors', 0)}
-- Skipped: {context.test_summary.get('skipped', 0)}
+        task = asyncio.ensure_future(make_request())
+        self._inflight[key] = task
 
-Your task is to:
-1. Analyze the test failures and error messages
-2. Correlate failures with must-gather logs when available
-3. Identify root causes
-4. Suggest concrete solutions
+        def _forget(done: asyncio.Future) -> None:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
 
-Be concise, technical, and actionable. Focus on the "why" and "how to fix"."""
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task)
+
+    async def _request_with_timeout(self, make_request: Callable[[], Awaitable], what: str) -> Any:
+        """
+        Await a backend request, retrying it if it exceeds request_timeout
+
+        Provider tail latency is much worse than the median, so a request
+        stuck past the timeout is abandoned and sent again. With no
+        request_timeout the request is simply awaited, once.
+
+        Args:
+            make_request: Returns a new request coroutine for each attempt
+            what: Request description for log messages
 
-        return prompt
+        Returns:
+            The request's result
+        """
+        if self.request_timeout is None:
+            return await make_request()
+
+        for attempt in range(_REQUEST_RETRIES + 1):
+            try:
+                return await asyncio.wait_for(make_request(), timeout=self.request_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                if attempt == _REQUEST_RETRIES:
+                    logger.error(f"{self.name} {what} timed out after {self.request_timeout}s "
+                                 f"({attempt + 1} attempts, {self.timeouts} timeouts total)")
+                    raise
+
+                delay = _RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"{self.name} {what} timed out after {self.request_timeout}s "
+                               f"({self.timeouts} timeouts total), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _parse_off_loop(parse: Callable[[str], Any], text: str) -> Any:
+        """
+        Run a response parser, on a worker thread if the response is large
+
+        Args:
+            parse: Synchronous parser taking the response text
+            text: Response text
+
+        Returns:
+            The parser's result
+        """
+        if len(text) <= _OFFLOAD_PARSE_CHARS:
+            return parse(text)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_PARSE_EXECUTOR, parse, text)
+
+    @staticmethod
+    async def _coalesce_stream(
+        chunks: AsyncIterator[str],
+        max_tokens: int = _STREAM_BATCH_TOKENS,
+        max_delay: float = _STREAM_BATCH_DELAY,
+        idle_timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Join streamed tokens into larger chunks before passing them on
+
+        Cuts per-token yields (and the SSE writes behind them) while keeping
+        latency bounded: a batch is flushed when it holds max_tokens tokens or
+        its first token has waited max_delay seconds. The next token is read
+        in the background while a batch is being consumed.
+
+        Args:
+            chunks: Token stream from the backend SDK
+            max_tokens: Tokens per batch
+            max_delay: Longest time a token is held back
+            idle_timeout: Raise asyncio.TimeoutError if no token arrives for this
+                many seconds (None waits indefinitely)
+
+        Returns:
+            AsyncIterator[str]: Concatenated token batches
+        """
+        loop = asyncio.get_running_loop()
+        iterator = chunks.__aiter__()
+        buffer: List[str] = []
+        deadline = 0.0
+        idle_deadline = None if idle_timeout is None else loop.time() + idle_timeout
+        pending = None
+
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                # asyncio.wait (unlike wait_for) leaves the read running on timeout
+                wake_at = deadline if buffer else idle_deadline
+                timeout = None if wake_at is None else max(wake_at - loop.time(), 0)
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                if not done:
+                    if not buffer:
+                        raise asyncio.TimeoutError(f"No streamed output for {idle_timeout}s")
+                    yield ''.join(buffer)
+                    buffer.clear()
+                    continue
+
+                read, pending = pending, None
+                try:
+                    text = read.result()
+                except StopAsyncIteration:
+                    break
+                except Exception:
+                    # Pass on what arrived before the failure, then let the caller report it
+                    if buffer:
+                        yield ''.join(buffer)
+                        buffer.clear()
+                    raise
+
+                if idle_deadline is not None:
+                    idle_deadline = loop.time() + idle_timeout
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer.append(text)
+                if len(buffer) >= max_tokens:
+                    yield ''.join(buffer)
+                    buffer.clear()
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        if buffer:
+            yield ''.join(buffer)
+
+    def _truncate_history(
+        self,
+        history: List[Dict],
+        max_tokens: int = _HISTORY_TOKEN_BUDGET,
+        min_messages: int = _HISTORY_MIN_MESSAGES
+    ) -> List[Dict]:
+        """
+        Keep the most recent chat messages that fit in a token budget
+
+        Args:
+            history: Conversation history [{'role': 'user|assistant', 'content': '...'}]
+            max_tokens: Approximate token budget for the kept messages
+            min_messages: Number of latest messages kept regardless of the budget
+
+        Returns:
+            List[Dict]: Tail of the history, starting with a user message when truncated
+        """
+        budget = max_tokens * _CHARS_PER_TOKEN
+        used = 0
+        start = len(history)
+
+        for i in range(len(history) - 1, -1, -1):
+            size = len(history[i].get('content') or '')
+            if len(history) - i > min_messages and used + size > budget:
+                break
+            used += size
+            start = i
+
+        if start == 0:
+            return history
+
+        # The backends expect the conversation to open with a user turn
+        while start < len(history) and history[start].get('role') != 'user':
+            start += 1
+
+        logger.debug(f"Chat history truncated to the last {len(history) - start} of {len(history)} messages")
+        return history[start:]
+
+    def _build_system_prompt(self, context: AnalysisContext) -> str:
+        """
+        Build system prompt for AI model
+
+        Args:
+            context: Analysis context
+
+        Returns:
+            str: System prompt
+        """
+        summary = context.test_summary
+        values = tuple(summary.get(key, default) for key, default in self._SUMMARY_DEFAULTS.items())
+        try:
+            return _render_system_prompt(self._SYSTEM_PROMPT_TEMPLATE, tuple(self._SUMMARY_DEFAULTS), values)
+        except TypeError:
+            # Unhashable summary values can't be memoized
+            return self._SYSTEM_PROMPT_TEMPLATE.format_map(ChainMap(summary, self._SUMMARY_DEFAULTS))
 
     def _format_failures_for_prompt(self, failures: List[Dict], max_failures: int = 5) -> str:
         """
@@ -172,25 +462,101 @@ Be concise, technical, and actionable. Focus on the "why" and "how to fix"."""
         Returns:
             str: Formatted failures text
         """
-        formatted = "Test Failures:\n\n"
+        fields = tuple(self._FAILURE_DEFAULTS)
+        rows = tuple(
+            tuple(failure.get(key, default) for key, default in self._FAILURE_DEFAULTS.items())
+            + (failure.get('traceback', ''),)
+            for failure in failures[:max_failures]
+        )
+        try:
+            return _render_failures(self._FAILURE_TEMPLATE, fields, rows, len(failures) - len(rows))
+        except TypeError:
+            # Unhashable failure values can't be memoized
+            return _render_failures.__wrapped__(self._FAILURE_TEMPLATE, fields, rows, len(failures) - len(rows))
+
+    def _format_log_excerpts_for_prompt(self, excerpts: List[Dict], max_excerpts: int = 5) -> str:
+        """
+        Format must-gather log excerpts for AI prompt
+
+        Args:
+            excerpts: Log excerpts ({'file': ..., 'context': ...})
+            max_excerpts: Maximum excerpts to include
+
+        Returns:
+            str: Formatted excerpts text, or '' if there are none
+        """
+        if not excerpts:
+            return ""
+
+        # List the selected excerpts in file/line order, so the same excerpts
+        # always produce the same prompt bytes
+        selected = sorted(
+            excerpts[:max_excerpts],
+            key=lambda excerpt: (str(excerpt.get('file', '')), excerpt.get('line_number') or 0)
+        )
+
+        parts = ["\n\nRelated Must-Gather Logs:\n"]
+        for i, excerpt in enumerate(selected, 1):
+            parts.append(f"\n{i}. File: {excerpt.get('file', 'Unknown')}\n")
+            parts.append(f"   Context:\n{excerpt.get('context', 'No context')}\n")
+
+        return _canonicalize_prompt(''.join(parts))
+
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _render_system_prompt(template: str, fields: Tuple[str, ...], values: Tuple) -> str:
+    """Render the system prompt template (memoized on the summary values)"""
+    return template.format_map(dict(zip(fields, values)))
+
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _render_failures(template: str, fields: Tuple[str, ...], rows: Tuple[Tuple, ...], omitted: int) -> str:
+    """
+    Render the failures section of a prompt (memoized on the failure fields)
+
+    Args:
+        template: Per-failure template
+        fields: Template field names
+        rows: Field values of each included failure, followed by its traceback
+        omitted: Number of failures left out of the prompt
+
+    Returns:
+        str: Formatted failures text
+    """
+    parts = ["Test Failures:\n\n"]
+
+    for i, row in enumerate(rows, 1):
+        parts.append(f"{i}. ")
+        parts.append(template.format_map(dict(zip(fields, row))))
+
+        traceback = row[-1]
+        if traceback:
+            # Limit traceback length; the split stops after the lines we keep
+            traceback_lines = traceback.split('\n', 10)[:10]
+            parts.append("   Traceback:\n")
+            for line in traceback_lines:
+                parts.append(f"     {line}\n")
+
+        parts.append("\n")
+
+    if omitted > 0:
+        parts.append(f"\n... and {omitted} more failures\n")
+
+    return _canonicalize_prompt(''.join(parts))
 
-        for i, failure in enumerate(failures[:max_failures], 1):
-            formatted += f"{i}. Test: {failure.get('test_name', 'Unknown')}\n"
-            formatted += f"   Class: {failure.get('class_name', 'Unknown')}\n"
-            formatted += f"   Type: {failure.get('failure_type', 'failure')}\n"
-            formatted += f"   Error: {failure.get('error_message', 'No message')}\n"
 
-            traceback = failure.get('traceback', '')
-            if traceback:
-                # Limit traceback length
-                traceback_lines = traceback.split('\n')[:10]
-                formatted += f"   Traceback:\n"
-                for line in traceback_lines:
-                    formatted += f"     {line}\n"
+def _canonicalize_prompt(text: str) -> str:
+    """
+    Normalize prompt text that comes from test results and logs
 
-            formatted += "\n"
+    Provider prompt caches (and the response cache) match on exact bytes,
+    so CRLF/CR line endings become LF and trailing blanks are removed.
+    Other whitespace is kept: tracebacks and log lines depend on it.
 
-        if len(failures) > max_failures:
-            formatted += f"\n... and {len(failures) - max_failures} more failures\n"
+    Args:
+        text: Prompt section
 
-        return formatted
+    Returns:
+        str: Canonical form of the section
+    """
+    return _TRAILING_BLANKS_RE.sub('', _LINE_ENDING_RE.sub('\n', text))
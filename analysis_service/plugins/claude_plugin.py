@@ -3,18 +3,40 @@ Claude AI Plugin
 Implements test failure analysis using Anthropic's Claude API
 """
 
-from typing import AsyncIterator, Dict, List, Union
+from importlib.util import find_spec
+from typing import AsyncIterator, Dict, List, Tuple, Union
+import copy
 import logging
-import anthropic
+import re
 
 from analysis_service.plugins.base import (
     AIBackendPlugin,
     AnalysisContext,
     AnalysisResult
 )
+from analysis_service.plugins.http_client import get_shared_async_client
+from analysis_service.plugins.response_cache import response_cache
+
+# The SDK is imported in initialize() so it only loads when the plugin is used;
+# fail here (as a top-level import would) so discovery skips the plugin
+if find_spec('anthropic') is None:
+    raise ImportError("No module named 'anthropic'")
 
 logger = logging.getLogger(__name__)
 
+# Anthropic prompt caching: the prompt prefix up to a block marked with this is cached for a few minutes
+_EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+# Case-insensitive markers used to pick apart the model's response, matched in one regex scan per line.
+# Markers must start a word, so "latest:" or "prefix" don't count as "test:" or "fix"
+_INSIGHT_MARKER_RE = re.compile(r'\b(?:test|failure|error|issue):', re.IGNORECASE)
+_SOLUTION_MARKER_RE = re.compile(r'\b(?:solution|fix|recommendation|suggest|resolution)', re.IGNORECASE)
+# A mention of a log together with a problem keyword, in either order
+_LOG_PROBLEM_RE = re.compile(
+    r'log.*(?:error|warn|fail|exception)|(?:error|warn|fail|exception).*log',
+    re.IGNORECASE
+)
+
 
 class ClaudePlugin(AIBackendPlugin):
     """Anthropic Claude AI backend plugin"""
@@ -24,6 +46,7 @@ class ClaudePlugin(AIBackendPlugin):
         self.client = None
         self.api_key = None
         self.model = "claude-3-5-sonnet-20241022"  # Latest Claude model
+        self.temperature = 0.7
 
     @property
     def name(self) -> str:
@@ -45,6 +68,8 @@ class ClaudePlugin(AIBackendPlugin):
             config: Configuration with 'api_key' field
         """
         self.api_key = config.get('api_key')
+        self.temperature = config.get('temperature', self.temperature)
+        self.request_timeout = config.get('request_timeout', self.request_timeout)
 
         if not self.api_key:
             logger.warning("Claude API key not provided")
@@ -52,7 +77,12 @@ class ClaudePlugin(AIBackendPlugin):
             return
 
         try:
-            self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
+            import anthropic
+
+            self.client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                http_client=get_shared_async_client()
+            )
             self.initialized = True
             logger.info("Claude plugin initialized successfully")
 
@@ -84,12 +114,7 @@ class ClaudePlugin(AIBackendPlugin):
         failures_text = self._format_failures_for_prompt(context.test_failures)
 
         # Add must-gather context if available
-        mustgather_text = ""
-        if context.log_excerpts:
-            mustgather_text = "\n\nRelated Must-Gather Logs:\n"
-            for i, excerpt in enumerate(context.log_excerpts[:5], 1):
-                mustgather_text += f"\n{i}. File: {excerpt.get('file', 'Unknown')}\n"
-                mustgather_text += f"   Context:\n{excerpt.get('context', 'No context')}\n"
+        mustgather_text = self._format_log_excerpts_for_prompt(context.log_excerpts)
 
         user_prompt = f"{failures_text}{mustgather_text}\n\nProvide a detailed analysis with:\n1. Summary of failure patterns\n2. Root cause analysis for each failure\n3. Correlated log insights\n4. Specific solutions"
 
@@ -97,7 +122,24 @@ class ClaudePlugin(AIBackendPlugin):
         if stream:
             return self._stream_analysis(system_prompt, user_prompt)
         else:
-            return self._complete_analysis(system_prompt, user_prompt)
+            key = response_cache.make_key(self.name, 'analysis', self.model, self.temperature,
+                                          system_prompt, user_prompt)
+            return self._single_flight(key, lambda: self._complete_analysis(system_prompt, user_prompt))
+
+    def _system_blocks(self, system_prompt: str) -> List[Dict]:
+        """
+        Wrap the system prompt as a cacheable content block
+
+        The system prompt only depends on the test summary, so requests
+        about the same results share it as a cached prompt prefix.
+
+        Args:
+            system_prompt: System prompt text
+
+        Returns:
+            list: System content blocks for the Messages API
+        """
+        return [{"type": "text", "text": system_prompt, "cache_control": _EPHEMERAL_CACHE}]
 
     async def _stream_analysis(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
         """Stream analysis response"""
@@ -105,13 +147,13 @@ class ClaudePlugin(AIBackendPlugin):
             async with self.client.messages.stream(
                 model=self.model,
                 max_tokens=4096,
-                temperature=0.7,
-                system=system_prompt,
+                temperature=self.temperature,
+                system=self._system_blocks(system_prompt),
                 messages=[
                     {"role": "user", "content": user_prompt}
                 ]
             ) as stream:
-                async for text in stream.text_stream:
+                async for text in self._coalesce_stream(stream.text_stream, idle_timeout=self.request_timeout):
                     yield text
 
         except Exception as e:
@@ -120,15 +162,28 @@ class ClaudePlugin(AIBackendPlugin):
 
     async def _complete_analysis(self, system_prompt: str, user_prompt: str) -> AnalysisResult:
         """Complete analysis response"""
+        cache_key = None
+        if response_cache.is_cacheable(self.temperature):
+            cache_key = response_cache.make_key(self.name, 'analysis', self.model, self.temperature,
+                                                system_prompt, user_prompt)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Claude analysis served from cache "
+                            f"(hits={response_cache.hits}, misses={response_cache.misses})")
+                return copy.deepcopy(cached)
+
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
+            response = await self._request_with_timeout(
+                lambda: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=4096,
+                    temperature=self.temperature,
+                    system=self._system_blocks(system_prompt),
+                    messages=[
+                        {"role": "user", "content": user_prompt}
+                    ]
+                ),
+                'analysis'
             )
 
             # Extract text from response
@@ -138,13 +193,10 @@ class ClaudePlugin(AIBackendPlugin):
                     analysis_text += block.text
 
             # Parse response into structured format
-            result = AnalysisResult(
-                summary=self._extract_section(analysis_text, "Summary", "Root Cause"),
-                failure_insights=self._parse_failure_insights(analysis_text),
-                suggested_solutions=self._parse_solutions(analysis_text),
-                correlated_logs=self._parse_correlated_logs(analysis_text),
-                confidence=0.90  # Claude generally has high confidence
-            )
+            result = await self._parse_off_loop(self._build_result, analysis_text)
+
+            if cache_key is not None:
+                response_cache.put(cache_key, copy.deepcopy(result))
 
             return result
 
@@ -152,6 +204,17 @@ class ClaudePlugin(AIBackendPlugin):
             logger.error(f"Claude analysis failed: {e}")
             raise
 
+    def _build_result(self, analysis_text: str) -> AnalysisResult:
+        """Parse the analysis text into an AnalysisResult"""
+        failure_insights, suggested_solutions, correlated_logs = self._parse_response(analysis_text)
+        return AnalysisResult(
+            summary=self._extract_section(analysis_text, "Summary", "Root Cause"),
+            failure_insights=failure_insights,
+            suggested_solutions=suggested_solutions,
+            correlated_logs=correlated_logs,
+            confidence=0.90  # Claude generally has high confidence
+        )
+
     def chat(
         self,
         message: str,
@@ -180,8 +243,8 @@ class ClaudePlugin(AIBackendPlugin):
         # Build message history in Claude format
         messages = []
 
-        # Add conversation history
-        for msg in history:
+        # Add conversation history (recent turns within the token budget)
+        for msg in self._truncate_history(history):
             role = msg.get('role')
             content = msg.get('content', '')
 
@@ -191,6 +254,16 @@ class ClaudePlugin(AIBackendPlugin):
                     "content": content
                 })
 
+        # Mark the end of the prior conversation as a cache breakpoint: the
+        # next turn resends the same prefix, which Claude then reads from
+        # its prompt cache instead of processing it again
+        if messages and messages[-1]['content']:
+            messages[-1]['content'] = [{
+                "type": "text",
+                "text": messages[-1]['content'],
+                "cache_control": _EPHEMERAL_CACHE
+            }]
+
         # Add current message
         messages.append({
             "role": "user",
@@ -201,17 +274,32 @@ class ClaudePlugin(AIBackendPlugin):
         if stream:
             return self._stream_chat_response(system_prompt, messages)
         else:
-            return self._complete_chat_response(system_prompt, messages)
+            key = response_cache.make_key(self.name, 'chat', self.model, self.temperature,
+                                          system_prompt, messages)
+            return self._single_flight(key, lambda: self._complete_chat_response(system_prompt, messages))
 
     async def _complete_chat_response(self, system_prompt: str, messages: List[Dict]) -> str:
         """Complete (non-streaming) chat response"""
+        cache_key = None
+        if response_cache.is_cacheable(self.temperature):
+            cache_key = response_cache.make_key(self.name, 'chat', self.model, self.temperature,
+                                                system_prompt, messages)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Claude chat response served from cache "
+                            f"(hits={response_cache.hits}, misses={response_cache.misses})")
+                return cached
+
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                temperature=0.7,
-                system=system_prompt,
-                messages=messages
+            response = await self._request_with_timeout(
+                lambda: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=2048,
+                    temperature=self.temperature,
+                    system=self._system_blocks(system_prompt),
+                    messages=messages
+                ),
+                'chat'
             )
 
             # Extract text from response
@@ -220,6 +308,9 @@ class ClaudePlugin(AIBackendPlugin):
                 if block.type == "text":
                     response_text += block.text
 
+            if cache_key is not None:
+                response_cache.put(cache_key, response_text)
+
             return response_text
 
         except Exception as e:
@@ -232,11 +323,11 @@ class ClaudePlugin(AIBackendPlugin):
             async with self.client.messages.stream(
                 model=self.model,
                 max_tokens=2048,
-                temperature=0.7,
-                system=system_prompt,
+                temperature=self.temperature,
+                system=self._system_blocks(system_prompt),
                 messages=messages
             ) as stream:
-                async for text in stream.text_stream:
+                async for text in self._coalesce_stream(stream.text_stream, idle_timeout=self.request_timeout):
                     yield text
 
         except Exception as e:
@@ -246,88 +337,80 @@ class ClaudePlugin(AIBackendPlugin):
     def _extract_section(self, text: str, start_marker: str, end_marker: str = None) -> str:
         """Extract text between markers"""
         try:
-            start_idx = text.lower().find(start_marker.lower())
-            if start_idx == -1:
+            # Case-insensitive search without lowercasing a copy of the whole response
+            # (re keeps the compiled marker patterns cached)
+            start_match = re.compile(re.escape(start_marker), re.IGNORECASE).search(text)
+            if start_match is None:
                 return text[:500]  # Return first 500 chars as fallback
+            start_idx = start_match.start()
 
             if end_marker:
-                end_idx = text.lower().find(end_marker.lower(), start_idx + len(start_marker))
-                if end_idx != -1:
-                    return text[start_idx:end_idx].strip()
+                end_match = re.compile(re.escape(end_marker), re.IGNORECASE).search(
+                    text, start_idx + len(start_marker))
+                if end_match is not None:
+                    return text[start_idx:end_match.start()].strip()
 
             return text[start_idx:start_idx + 1000].strip()
 
         except Exception:
             return text[:500]
 
-    def _parse_failure_insights(self, text: str) -> List[Dict]:
-        """Parse failure insights from response"""
+    def _parse_response(self, text: str) -> Tuple[List[Dict], List[str], List[str]]:
+        """
+        Parse the analysis response in a single pass over its lines
+
+        Args:
+            text: Analysis text from Claude
+
+        Returns:
+            Tuple of (failure insights, suggested solutions, correlated log references)
+        """
         insights = []
+        solutions = []
+        logs = []
 
-        # Look for structured sections
-        lines = text.split('\n')
-        current_insight = {}
+        # Lines of the insight being read, joined once it is complete
+        current_parts = []
+        in_solution_section = False
 
-        for line in lines:
-            line = line.strip()
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
 
-            # Detect insight markers
-            if any(marker in line.lower() for marker in ['test:', 'failure:', 'error:', 'issue:']):
-                if current_insight:
-                    insights.append(current_insight)
-                current_insight = {'description': line}
+            # Failure insights: detect insight markers
+            if _INSIGHT_MARKER_RE.search(line):
+                if current_parts:
+                    insights.append({'description': ' '.join(current_parts)})
+                current_parts = [line]
 
             elif line.startswith(('-', '*', '•', '1.', '2.', '3.', '4.', '5.')):
-                if current_insight:
-                    insights.append(current_insight)
-                current_insight = {'description': line.lstrip('-*•0123456789. ')}
+                if current_parts:
+                    insights.append({'description': ' '.join(current_parts)})
+                current_parts = [line.lstrip('-*•0123456789. ')]
 
-            elif current_insight and line and not line.startswith('#'):
+            elif current_parts and line and not line.startswith('#'):
                 # Continue current insight
-                current_insight['description'] = current_insight.get('description', '') + ' ' + line
-
-        if current_insight:
-            insights.append(current_insight)
-
-        return insights[:10]  # Limit to 10 insights
-
-    def _parse_solutions(self, text: str) -> List[str]:
-        """Parse suggested solutions"""
-        solutions = []
-
-        # Look for solution section
-        solution_markers = ['solution', 'fix', 'recommendation', 'suggest', 'resolution']
-        lines = text.split('\n')
-
-        in_solution_section = False
-        for line in lines:
-            line_lower = line.lower().strip()
+                current_parts.append(line)
 
-            # Check if we're entering solution section
-            if any(marker in line_lower for marker in solution_markers):
+            # Suggested solutions: check if we're entering solution section
+            if _SOLUTION_MARKER_RE.search(line):
                 in_solution_section = True
-                continue
 
             # Extract numbered or bulleted solutions
-            if in_solution_section:
-                if line.strip().startswith(('-', '*', '•')) or (len(line) > 0 and line[0].isdigit()):
-                    solution = line.strip().lstrip('-*•0123456789. ')
+            elif in_solution_section:
+                if line.startswith(('-', '*', '•')) or (len(raw_line) > 0 and raw_line[0].isdigit()):
+                    solution = line.lstrip('-*•0123456789. ')
                     if solution and len(solution) > 10:  # Filter out headers
                         solutions.append(solution)
 
-        return solutions[:10]  # Limit to 10 solutions
-
-    def _parse_correlated_logs(self, text: str) -> List[str]:
-        """Parse correlated log references"""
-        logs = []
+            # Correlated log references
+            if _LOG_PROBLEM_RE.search(line):
+                logs.append(line)
 
-        lines = text.split('\n')
-        for line in lines:
-            line_lower = line.lower()
-            if 'log' in line_lower and any(keyword in line_lower for keyword in ['error', 'warn', 'fail', 'exception']):
-                logs.append(line.strip())
+        if current_parts:
+            insights.append({'description': ' '.join(current_parts)})
 
-        return logs[:5]  # Limit to 5 log references
+        # Limit to 10 insights, 10 solutions and 5 log references
+        return insights[:10], solutions[:10], logs[:5]
 
     async def health_check(self) -> bool:
         """
@@ -3,18 +3,52 @@ Gemini AI Plugin
 Implements test failure analysis using Google's Gemini API (google-genai package)
 """
 
-from typing import AsyncIterator, Dict, List, Union
+from importlib.util import find_spec
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+import copy
 import logging
-from google import genai
+import re
+import time
 
 from analysis_service.plugins.base import (
     AIBackendPlugin,
     AnalysisContext,
     AnalysisResult
 )
+from analysis_service.plugins.http_client import get_shared_async_client
+from analysis_service.plugins.response_cache import response_cache
+
+# The SDK is imported in initialize() so it only loads when the plugin is used;
+# fail here (as a top-level import would) so discovery skips the plugin
+if find_spec('google.genai') is None:
+    raise ImportError("No module named 'google.genai'")
 
 logger = logging.getLogger(__name__)
 
+# Lifetime of a server-side context cache holding a prompt prefix
+_CONTEXT_CACHE_TTL_SECONDS = 600
+# Stop reusing a context cache this long before Gemini expires it
+_CONTEXT_CACHE_MARGIN_SECONDS = 30
+# Gemini rejects context caches below a minimum token count (4096 for
+# 2.5 Pro); at ~4 characters per token, smaller prefixes are sent inline
+_MIN_CACHED_PREFIX_CHARS = 4096 * 4
+# After a failed cache creation, send that prefix inline for this long before trying again
+_CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS = 300
+
+# Chat history roles as Gemini names them; other roles are not sent
+_CHAT_ROLES = {'user': 'user', 'assistant': 'model'}
+# Model turn acknowledging the system context; never mutated, so every chat shares it
+_CONTEXT_ACK_TURN = {
+    'role': 'model',
+    'parts': [{'text': 'I understand. I will analyze test failures based on this context.'}]
+}
+
+# Case-insensitive markers used to pick apart the model's response, matched in one regex scan per line.
+# Markers must start a word, so e.g. "prefix" doesn't count as "fix"
+_SOLUTION_MARKER_RE = re.compile(r'\b(?:solution|fix|recommendation|suggest)', re.IGNORECASE)
+# A mention of a log together with an error or warning, in either order
+_LOG_PROBLEM_RE = re.compile(r'log.*(?:error|warn)|(?:error|warn).*log', re.IGNORECASE)
+
 
 class GeminiPlugin(AIBackendPlugin):
     """Google Gemini AI backend plugin"""
@@ -25,6 +59,14 @@ class GeminiPlugin(AIBackendPlugin):
         self.api_key = None
         # Use Gemini 2.5 Pro
         self.model_name = "models/gemini-2.5-pro"
+        # None leaves sampling temperature at the model default
+        self.temperature = None
+        # Context caches created for prompt prefixes: key -> (cache name, reuse deadline)
+        self._cached_content_cache: Dict[str, Tuple[str, float]] = {}
+        # Prefixes seen once without a cache: key -> time after which a repeat no longer counts
+        self._uncached_prefixes: Dict[str, float] = {}
+        # Prefixes whose cache creation failed: key -> time to try again
+        self._cached_content_failures: Dict[str, float] = {}
 
     @property
     def name(self) -> str:
@@ -46,6 +88,8 @@ class GeminiPlugin(AIBackendPlugin):
             config: Configuration with 'api_key' field
         """
         self.api_key = config.get('api_key')
+        self.temperature = config.get('temperature', self.temperature)
+        self.request_timeout = config.get('request_timeout', self.request_timeout)
 
         if not self.api_key:
             logger.warning("Gemini API key not provided")
@@ -53,8 +97,18 @@ class GeminiPlugin(AIBackendPlugin):
             return
 
         try:
-            # Initialize the Gemini client
-            self.client = genai.Client(api_key=self.api_key)
+            from google import genai
+
+            # Initialize the Gemini client on the shared connection pool
+            try:
+                self.client = genai.Client(
+                    api_key=self.api_key,
+                    http_options={'httpx_async_client': get_shared_async_client()}
+                )
+            except (TypeError, ValueError) as e:
+                # google-genai releases without custom httpx client support
+                logger.warning(f"Gemini client can't use the shared HTTP client, using its own: {e}")
+                self.client = genai.Client(api_key=self.api_key)
 
             self.initialized = True
             logger.info("Gemini plugin initialized successfully")
@@ -83,68 +137,175 @@ class GeminiPlugin(AIBackendPlugin):
             raise RuntimeError("Gemini plugin not initialized")
 
         # Build prompt
-        full_prompt = self._build_full_prompt(context)
+        prefix, instructions = self._build_prompt_parts(context)
 
         # Return the appropriate generator or coroutine
         if stream:
             # Return async generator directly
-            return self._stream_analysis(full_prompt)
+            return self._stream_analysis(prefix, instructions)
         else:
             # Return coroutine (will be awaited by caller)
-            return self._complete_analysis(full_prompt)
+            key = response_cache.make_key(self.name, 'analysis', self.model_name, self.temperature,
+                                          prefix + instructions)
+            return self._single_flight(key, lambda: self._complete_analysis(prefix, instructions))
+
+    def _generation_config(self, cached_content: Optional[str] = None) -> Optional[Dict]:
+        """Generation settings for generate_content, or None for the model defaults"""
+        config = {}
+        if self.temperature is not None:
+            config['temperature'] = self.temperature
+        if cached_content is not None:
+            config['cached_content'] = cached_content
+        return config or None
+
+    async def _get_cached_content(self, prefix: str) -> Optional[str]:
+        """
+        Get a Gemini context cache holding a prompt prefix, creating it if needed
+
+        A cache is only created the second time a prefix is seen within the
+        cache lifetime, so a one-off prompt isn't uploaded (and stored) for
+        nothing. A prefix whose cache creation failed is sent inline until
+        a cooldown has passed.
+
+        Args:
+            prefix: Prompt text shared by repeated requests
+
+        Returns:
+            str: Cached content name, or None if the prefix should be sent inline
+        """
+        if len(prefix) < _MIN_CACHED_PREFIX_CHARS:
+            return None
+
+        key = response_cache.make_key(self.model_name, prefix)
+        now = time.monotonic()
+        entry = self._cached_content_cache.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        if self._cached_content_failures.get(key, 0.0) > now:
+            return None
+
+        # Drop bookkeeping for caches, sightings and failures that have expired
+        self._cached_content_cache = {
+            k: v for k, v in self._cached_content_cache.items() if v[1] > now
+        }
+        self._uncached_prefixes = {k: v for k, v in self._uncached_prefixes.items() if v > now}
+        self._cached_content_failures = {k: v for k, v in self._cached_content_failures.items() if v > now}
+
+        if self._uncached_prefixes.pop(key, None) is None:
+            # First sighting: send inline, cache if it comes back
+            self._uncached_prefixes[key] = now + _CONTEXT_CACHE_TTL_SECONDS
+            return None
+
+        try:
+            cached_content = await self.client.aio.caches.create(
+                model=self.model_name,
+                config={'contents': prefix, 'ttl': f"{_CONTEXT_CACHE_TTL_SECONDS}s"}
+            )
+        except Exception as e:
+            logger.warning(f"Gemini context cache unavailable, sending full prompt: {e}")
+            self._cached_content_failures[key] = now + _CONTEXT_CACHE_FAILURE_COOLDOWN_SECONDS
+            return None
+
+        deadline = now + _CONTEXT_CACHE_TTL_SECONDS - _CONTEXT_CACHE_MARGIN_SECONDS
+        self._cached_content_cache[key] = (cached_content.name, deadline)
+        logger.debug(f"Created Gemini context cache {cached_content.name} ({len(prefix)} chars)")
+        return cached_content.name
+
+    def _forget_cached_content(self, prefix: str) -> None:
+        """Stop reusing the context cache for a prefix (e.g. after Gemini rejected it)"""
+        self._cached_content_cache.pop(response_cache.make_key(self.model_name, prefix), None)
 
-    def _build_full_prompt(self, context: AnalysisContext) -> str:
-        """Build the full analysis prompt"""
+    async def _generate(self, prefix: str, suffix: str, stream: bool = False):
+        """
+        Call generate_content with the prefix served from a context cache when possible
+
+        Args:
+            prefix: Leading prompt text, identical across requests
+            suffix: Remainder of the prompt
+            stream: Use generate_content_stream
+
+        Returns:
+            The generate_content response or response stream
+        """
+        generate = (self.client.aio.models.generate_content_stream if stream
+                    else self.client.aio.models.generate_content)
+
+        cached_content = await self._get_cached_content(prefix)
+        if cached_content is not None:
+            try:
+                return await generate(
+                    model=self.model_name,
+                    contents=suffix,
+                    config=self._generation_config(cached_content)
+                )
+            except Exception as e:
+                logger.warning(f"Gemini request with context cache {cached_content} failed, "
+                               f"retrying with full prompt: {e}")
+                self._forget_cached_content(prefix)
+
+        return await generate(
+            model=self.model_name,
+            contents=prefix + suffix,
+            config=self._generation_config()
+        )
+
+    def _build_prompt_parts(self, context: AnalysisContext) -> Tuple[str, str]:
+        """
+        Build the analysis prompt as (context prefix, instructions)
+
+        The prefix carries the system prompt, failures and must-gather logs,
+        which is the part worth holding in a Gemini context cache.
+        """
         system_prompt = self._build_system_prompt(context)
         failures_text = self._format_failures_for_prompt(context.test_failures)
 
         # Add must-gather context if available
-        mustgather_text = ""
-        if context.log_excerpts:
-            mustgather_text = "\n\nRelated Must-Gather Logs:\n"
-            for i, excerpt in enumerate(context.log_excerpts[:5], 1):
-                mustgather_text += f"\n{i}. File: {excerpt.get('file', 'Unknown')}\n"
-                mustgather_text += f"   Context:\n{excerpt.get('context', 'No context')}\n"
+        mustgather_text = self._format_log_excerpts_for_prompt(context.log_excerpts)
 
-        return f"{system_prompt}\n\n{failures_text}{mustgather_text}\n\nProvide a detailed analysis with:\n1. Summary of failure patterns\n2. Root cause analysis for each failure\n3. Correlated log insights\n4. Specific solutions"
+        prefix = f"{system_prompt}\n\n{failures_text}{mustgather_text}"
+        instructions = "\n\nProvide a detailed analysis with:\n1. Summary of failure patterns\n2. Root cause analysis for each failure\n3. Correlated log insights\n4. Specific solutions"
+        return prefix, instructions
 
-    async def _stream_analysis(self, prompt: str) -> AsyncIterator[str]:
+    async def _stream_analysis(self, prefix: str, instructions: str) -> AsyncIterator[str]:
         """Stream analysis response as async generator"""
         try:
             # Use new API streaming - await the coroutine first
-            stream = await self.client.aio.models.generate_content_stream(
-                model=self.model_name,
-                contents=prompt
-            )
+            stream = await self._generate(prefix, instructions, stream=True)
 
-            async for chunk in stream:
-                if chunk.text:
-                    yield chunk.text
+            texts = (chunk.text async for chunk in stream if chunk.text)
+            async for text in self._coalesce_stream(texts, idle_timeout=self.request_timeout):
+                yield text
 
         except Exception as e:
             logger.error(f"Gemini streaming failed: {e}")
             yield f"\n\n[Error: {str(e)}]"
 
-    async def _complete_analysis(self, prompt: str) -> AnalysisResult:
+    async def _complete_analysis(self, prefix: str, instructions: str) -> AnalysisResult:
         """Complete analysis response"""
+        cache_key = None
+        if response_cache.is_cacheable(self.temperature):
+            cache_key = response_cache.make_key(self.name, 'analysis', self.model_name, self.temperature,
+                                                prefix + instructions)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Gemini analysis served from cache "
+                            f"(hits={response_cache.hits}, misses={response_cache.misses})")
+                return copy.deepcopy(cached)
+
         try:
             # Use new API non-streaming
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
+            response = await self._request_with_timeout(
+                lambda: self._generate(prefix, instructions), 'analysis')
 
             # Parse response into structured format
             analysis_text = response.text
 
             # Simple parsing - in production, you'd use more sophisticated extraction
-            result = AnalysisResult(
-                summary=self._extract_section(analysis_text, "Summary", "Root Cause"),
-                failure_insights=self._parse_failure_insights(analysis_text),
-                suggested_solutions=self._parse_solutions(analysis_text),
-                correlated_logs=self._parse_correlated_logs(analysis_text),
-                confidence=0.85  # Could be enhanced with confidence scoring
-            )
+            result = await self._parse_off_loop(self._build_result, analysis_text)
+
+            if cache_key is not None:
+                response_cache.put(cache_key, copy.deepcopy(result))
 
             return result
 
@@ -152,6 +313,17 @@ class GeminiPlugin(AIBackendPlugin):
             logger.error(f"Gemini analysis failed: {e}")
             raise
 
+    def _build_result(self, analysis_text: str) -> AnalysisResult:
+        """Parse the analysis text into an AnalysisResult"""
+        failure_insights, suggested_solutions, correlated_logs = self._parse_response(analysis_text)
+        return AnalysisResult(
+            summary=self._extract_section(analysis_text, "Summary", "Root Cause"),
+            failure_insights=failure_insights,
+            suggested_solutions=suggested_solutions,
+            correlated_logs=correlated_logs,
+            confidence=0.85  # Could be enhanced with confidence scoring
+        )
+
     def chat(
         self,
         message: str,
@@ -190,41 +362,27 @@ class GeminiPlugin(AIBackendPlugin):
     async def _chat_complete_wrapper(self, message: str, history: List[Dict], context: AnalysisContext) -> str:
         """Wrapper to set up chat and get complete response"""
         chat_session = await self._setup_chat_session(context, history)
-        return await self._complete_chat_response(chat_session, message)
+        key = response_cache.make_key(self.name, 'chat', self.model_name, self.temperature,
+                                      chat_session, message)
+        return await self._single_flight(key, lambda: self._complete_chat_response(chat_session, message))
 
     async def _setup_chat_session(self, context: AnalysisContext, history: List[Dict]):
         """Set up chat session with context and history"""
         try:
             system_prompt = self._build_system_prompt(context)
 
-            # Build chat history in new format
-            chat_history = []
-
-            # Add system context as first user message
-            chat_history.append({
-                'role': 'user',
-                'parts': [{'text': system_prompt}]
-            })
-            chat_history.append({
-                'role': 'model',
-                'parts': [{'text': 'I understand. I will analyze test failures based on this context.'}]
-            })
-
-            # Add conversation history
-            for msg in history:
-                role = msg.get('role')
-                content = msg.get('content', '')
-
-                if role == 'user':
-                    chat_history.append({
-                        'role': 'user',
-                        'parts': [{'text': content}]
-                    })
-                elif role == 'assistant':
-                    chat_history.append({
-                        'role': 'model',
-                        'parts': [{'text': content}]
-                    })
+            # Build chat history in new format: system context as the first
+            # user message, then the conversation (recent turns within the
+            # token budget) with roles mapped to Gemini's
+            chat_history = [
+                {'role': 'user', 'parts': [{'text': system_prompt}]},
+                _CONTEXT_ACK_TURN
+            ]
+            chat_history.extend(
+                {'role': _CHAT_ROLES[msg['role']], 'parts': [{'text': msg.get('content', '')}]}
+                for msg in self._truncate_history(history)
+                if msg.get('role') in _CHAT_ROLES
+            )
 
             return chat_history
 
@@ -244,12 +402,13 @@ class GeminiPlugin(AIBackendPlugin):
             # Use new API streaming with chat history - await the coroutine first
             stream = await self.client.aio.models.generate_content_stream(
                 model=self.model_name,
-                contents=chat_history
+                contents=chat_history,
+                config=self._generation_config()
             )
 
-            async for chunk in stream:
-                if chunk.text:
-                    yield chunk.text
+            texts = (chunk.text async for chunk in stream if chunk.text)
+            async for text in self._coalesce_stream(texts, idle_timeout=self.request_timeout):
+                yield text
 
         except Exception as e:
             logger.error(f"Gemini chat streaming failed: {e}")
@@ -264,11 +423,28 @@ class GeminiPlugin(AIBackendPlugin):
                 'parts': [{'text': message}]
             })
 
+            cache_key = None
+            if response_cache.is_cacheable(self.temperature):
+                cache_key = response_cache.make_key(self.name, 'chat', self.model_name, self.temperature, chat_history)
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Gemini chat response served from cache "
+                                f"(hits={response_cache.hits}, misses={response_cache.misses})")
+                    return cached
+
             # Use new API non-streaming with chat history
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name,
-                contents=chat_history
+            response = await self._request_with_timeout(
+                lambda: self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=chat_history,
+                    config=self._generation_config()
+                ),
+                'chat'
             )
+
+            if cache_key is not None and response.text is not None:
+                response_cache.put(cache_key, response.text)
+
             return response.text
         except Exception as e:
             logger.error(f"Gemini chat failed: {e}")
@@ -277,78 +453,73 @@ class GeminiPlugin(AIBackendPlugin):
     def _extract_section(self, text: str, start_marker: str, end_marker: str = None) -> str:
         """Extract text between markers"""
         try:
-            start_idx = text.lower().find(start_marker.lower())
-            if start_idx == -1:
+            # Case-insensitive search without lowercasing a copy of the whole response
+            # (re keeps the compiled marker patterns cached)
+            start_match = re.compile(re.escape(start_marker), re.IGNORECASE).search(text)
+            if start_match is None:
                 return text[:500]  # Return first 500 chars as fallback
+            start_idx = start_match.start()
 
             if end_marker:
-                end_idx = text.lower().find(end_marker.lower(), start_idx + len(start_marker))
-                if end_idx != -1:
-                    return text[start_idx:end_idx].strip()
+                end_match = re.compile(re.escape(end_marker), re.IGNORECASE).search(
+                    text, start_idx + len(start_marker))
+                if end_match is not None:
+                    return text[start_idx:end_match.start()].strip()
 
             return text[start_idx:start_idx + 1000].strip()
 
         except Exception:
             return text[:500]
 
-    def _parse_failure_insights(self, text: str) -> List[Dict]:
-        """Parse failure insights from response"""
-        insights = []
-
-        # Simple line-based parsing
-        lines = text.split('\n')
-        current_insight = {}
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Test:') or line.startswith('-'):
-                if current_insight:
-                    insights.append(current_insight)
-                current_insight = {'description': line}
-            elif current_insight and line:
-                current_insight['description'] = current_insight.get('description', '') + ' ' + line
-
-        if current_insight:
-            insights.append(current_insight)
+    def _parse_response(self, text: str) -> Tuple[List[Dict], List[str], List[str]]:
+        """
+        Parse the analysis response in a single pass over its lines
 
-        return insights[:10]  # Limit to 10 insights
+        Args:
+            text: Analysis text from Gemini
 
-    def _parse_solutions(self, text: str) -> List[str]:
-        """Parse suggested solutions"""
+        Returns:
+            Tuple of (failure insights, suggested solutions, correlated log references)
+        """
+        insights = []
         solutions = []
+        logs = []
 
-        # Look for solution section
-        solution_markers = ['solution', 'fix', 'recommendation', 'suggest']
-        lines = text.split('\n')
-
+        # Lines of the insight being read, joined once it is complete
+        current_parts = []
         in_solution_section = False
-        for line in lines:
-            line_lower = line.lower().strip()
 
-            # Check if we're entering solution section
-            if any(marker in line_lower for marker in solution_markers):
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+
+            # Failure insights: simple line-based parsing
+            if line.startswith('Test:') or line.startswith('-'):
+                if current_parts:
+                    insights.append({'description': ' '.join(current_parts)})
+                current_parts = [line]
+            elif current_parts and line:
+                current_parts.append(line)
+
+            # Suggested solutions: check if we're entering solution section
+            if _SOLUTION_MARKER_RE.search(line):
                 in_solution_section = True
-                continue
 
             # Extract numbered or bulleted solutions
-            if in_solution_section and (line.strip().startswith(('-', '*', '•')) or
-                                       (len(line) > 0 and line[0].isdigit())):
-                solution = line.strip().lstrip('-*•0123456789. ')
+            elif in_solution_section and (line.startswith(('-', '*', '•')) or
+                                          (len(raw_line) > 0 and raw_line[0].isdigit())):
+                solution = line.lstrip('-*•0123456789. ')
                 if solution:
                     solutions.append(solution)
 
-        return solutions[:10]  # Limit to 10 solutions
-
-    def _parse_correlated_logs(self, text: str) -> List[str]:
-        """Parse correlated log references"""
-        logs = []
+            # Correlated log references
+            if _LOG_PROBLEM_RE.search(line):
+                logs.append(line)
 
-        lines = text.split('\n')
-        for line in lines:
-            if 'log' in line.lower() and ('error' in line.lower() or 'warn' in line.lower()):
-                logs.append(line.strip())
+        if current_parts:
+            insights.append({'description': ' '.join(current_parts)})
 
-        return logs[:5]  # Limit to 5 log references
+        # Limit to 10 insights, 10 solutions and 5 log references
+        return insights[:10], solutions[:10], logs[:5]
 
     async def health_check(self) -> bool:
         """
@@ -0,0 +1,63 @@
+"""
+Shared HTTP Client
+One pooled httpx.AsyncClient for the AI backend SDKs
+"""
+
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Optional
+import logging
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by all backends; idle connections are kept for reuse
+_MAX_CONNECTIONS = 64
+_MAX_KEEPALIVE_CONNECTIONS = 32
+
+# SDK defaults: 10 minutes for long generations, 5 seconds to connect
+_TIMEOUT_SECONDS = 600.0
+_CONNECT_TIMEOUT_SECONDS = 5.0
+
+_client: Optional['httpx.AsyncClient'] = None
+
+
+def get_shared_async_client() -> 'httpx.AsyncClient':
+    """
+    Get the process-wide HTTP client, creating it on first use
+
+    Plugins pass this to their SDK clients so requests reuse pooled
+    connections (and TLS sessions) instead of each SDK client opening its
+    own, including across plugin re-initialization.
+
+    Returns:
+        httpx.AsyncClient: Shared client (HTTP/2 when the h2 package is installed)
+    """
+    global _client
+
+    if _client is None or _client.is_closed:
+        # Imported on first use, like the SDKs that need it
+        import httpx
+
+        http2 = find_spec('h2') is not None  # httpx needs h2 for HTTP/2
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=_MAX_CONNECTIONS,
+                max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(_TIMEOUT_SECONDS, connect=_CONNECT_TIMEOUT_SECONDS)
+        )
+        logger.info(f"Created shared HTTP client (http2={http2})")
+
+    return _client
+
+
+async def close_shared_async_client() -> None:
+    """Close the shared HTTP client and its pooled connections"""
+    global _client
+
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -3,10 +3,29 @@ MCP (Model Context Protocol) Plugin
 Integrates with MCP servers for test failure analysis
 """
 
-from typing import AsyncIterator, Dict, List, Union, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Union, Optional
+import gzip
 import logging
+import weakref
 import aiohttp
-import json
+
+try:
+    import orjson
+
+    def _dump_payload(payload: Any) -> bytes:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+    _load_json = orjson.loads
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    import json
+
+    def _dump_payload(payload: Any) -> bytes:
+        return json.dumps(payload).encode('utf-8')
+
+    _load_json = json.loads
+    _JSONDecodeError = json.JSONDecodeError
 
 from analysis_service.plugins.base import (
     AIBackendPlugin,
@@ -16,6 +35,98 @@ from analysis_service.plugins.base import (
 
 logger = logging.getLogger(__name__)
 
+# Request bodies are serialized to bytes up front (see _encode_request) rather than via json=
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_SSE_HEADERS = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+
+# Connection pool defaults (overridable via plugin config)
+_DEFAULT_POOL_LIMIT = 256
+_DEFAULT_POOL_LIMIT_PER_HOST = 64
+_DEFAULT_KEEPALIVE_TIMEOUT = 60
+_DNS_CACHE_TTL = 300
+# Only connecting is bounded; analyses and streams may run as long as the server needs
+_SESSION_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=None)
+_HEALTH_TIMEOUT = aiohttp.ClientTimeout(total=5)
+# Larger socket reads for streamed responses (aiohttp defaults to 64KiB)
+_READ_BUFSIZE = 2 ** 18
+# Encoded failure lists kept for reuse by later requests over the same results
+_ENCODED_FAILURES_CACHE_SIZE = 8
+# Opt-in request body compression (the MCP server must accept Content-Encoding: gzip);
+# responses are already negotiated by aiohttp, which sends Accept-Encoding and decompresses
+_COMPRESS_MIN_BYTES = 8 * 1024
+_COMPRESS_LEVEL = 5
+
+
+async def _iter_line_batches(content: aiohttp.StreamReader) -> AsyncIterator[List[bytes]]:
+    """
+    Split a response body into lines, one batch per network read
+
+    Reading whatever has arrived (iter_any) and splitting it in one go costs
+    one await per read instead of one per line. A partial line is kept in a
+    single reused buffer, so a line spread over many reads is not recopied
+    on each one.
+
+    Args:
+        content: Response body stream
+
+    Returns:
+        AsyncIterator[List[bytes]]: Complete lines (newline removed) received by each read
+    """
+    buf = bytearray()
+    async for data in content.iter_any():
+        end = data.rfind(b'\n')
+        if end == -1:
+            buf += data
+            continue
+
+        buf += data[:end]
+        lines = buf.split(b'\n')
+        buf[:] = data[end + 1:]
+        yield [bytes(line) for line in lines]
+
+    if buf:
+        yield [bytes(buf)]
+
+
+async def _iter_sse_text(response: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """
+    Yield the text chunks of a Server-Sent Events response
+
+    Lines are handled as bytes; only the text passed on is decoded.
+
+    Args:
+        response: Streaming response from the MCP server
+
+    Returns:
+        AsyncIterator[str]: 'text' of each JSON data event, or the raw data if it isn't JSON
+    """
+    async for lines in _iter_line_batches(response.content):
+        for line in lines:
+            line = line.strip()
+
+            if not line.startswith(b'data: '):
+                continue
+            data = line[6:]  # Remove 'data: ' prefix
+
+            if data == b'[DONE]':
+                return
+
+            try:
+                chunk = _load_json(data)
+            except _JSONDecodeError:
+                # Plain text chunk
+                yield data.decode('utf-8')
+                continue
+
+            if 'text' in chunk:
+                yield chunk['text']
+
+
+def _warn_unclosed(session: aiohttp.ClientSession) -> None:
+    """Finalizer for a collected plugin: report (but don't close) a session left open"""
+    if not session.closed:
+        logger.warning("MCP plugin was garbage collected without cleanup(); its session was left open")
+
 
 class MCPPlugin(AIBackendPlugin):
     """MCP Server integration plugin"""
@@ -24,6 +135,10 @@ class MCPPlugin(AIBackendPlugin):
         super().__init__()
         self.server_url = None
         self.session = None
+        self._finalizer = None
+        self.compress_requests = False
+        # id(test_failures) -> (test_failures, its length, its JSON encoding)
+        self._encoded_failures: OrderedDict = OrderedDict()
 
     @property
     def name(self) -> str:
@@ -42,9 +157,12 @@ class MCPPlugin(AIBackendPlugin):
         Initialize MCP plugin with server URL
 
         Args:
-            config: Configuration with 'server_url' field
+            config: Configuration with 'server_url' field, and optionally
+                'pool_limit', 'pool_limit_per_host', 'keepalive_timeout' and
+                'compress_requests' (gzip large request bodies)
         """
         self.server_url = config.get('server_url', 'http://localhost:9000')
+        self.compress_requests = bool(config.get('compress_requests', False))
 
         if not self.server_url:
             logger.warning("MCP server URL not provided")
@@ -52,11 +170,30 @@ class MCPPlugin(AIBackendPlugin):
             return
 
         try:
-            # Create aiohttp session
-            self.session = aiohttp.ClientSession()
-
-            # Test connection to MCP server
-            async with self.session.get(f"{self.server_url}/health") as response:
+            # Replace the session from a previous initialization
+            await self.cleanup()
+
+            # Create aiohttp session on a pooled, keep-alive connector so
+            # requests reuse connections instead of reconnecting each time
+            connector = aiohttp.TCPConnector(
+                limit=config.get('pool_limit', _DEFAULT_POOL_LIMIT),
+                limit_per_host=config.get('pool_limit_per_host', _DEFAULT_POOL_LIMIT_PER_HOST),
+                keepalive_timeout=config.get('keepalive_timeout', _DEFAULT_KEEPALIVE_TIMEOUT),
+                ttl_dns_cache=_DNS_CACHE_TTL,
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=_SESSION_TIMEOUT,
+                read_bufsize=_READ_BUFSIZE
+            )
+            self._finalizer = weakref.finalize(self, _warn_unclosed, self.session)
+
+            # Test connection to MCP server (this also warms one pooled connection)
+            async with self.session.get(
+                f"{self.server_url}/health",
+                timeout=_HEALTH_TIMEOUT
+            ) as response:
                 if response.status == 200:
                     self.initialized = True
                     logger.info(f"MCP plugin initialized successfully: {self.server_url}")
@@ -90,72 +227,118 @@ class MCPPlugin(AIBackendPlugin):
             raise RuntimeError("MCP plugin not initialized")
 
         # Build request payload
-        payload = {
+        body = self._encode_request({
             "action": "analyze_failures",
-            "context": context.to_dict(),
             "stream": stream
-        }
+        }, context)
 
         try:
             if stream:
-                return self._stream_analysis(payload)
+                return self._stream_analysis(body)
             else:
-                return await self._complete_analysis(payload)
+                return await self._complete_analysis(body)
 
         except Exception as e:
             logger.error(f"MCP analysis failed: {e}")
             raise
 
-    async def _stream_analysis(self, payload: Dict) -> AsyncIterator[str]:
-        """Stream analysis response from MCP server"""
+    def _encode_request(self, fields: Dict, context: AnalysisContext) -> bytes:
+        """
+        Encode a request body: the given fields plus the analysis context
+
+        The failures list is usually the same object across requests over
+        one set of results (e.g. every turn of a chat), so its encoding is
+        kept and spliced into later request bodies instead of being redone.
+
+        Args:
+            fields: Request fields other than the context
+            context: Analysis context, sent as 'context' (same shape as to_dict())
+
+        Returns:
+            bytes: JSON request body
+        """
+        failures = context.test_failures
+        entry = self._encoded_failures.get(id(failures))
+        if entry is not None and entry[0] is failures and entry[1] == len(failures):
+            self._encoded_failures.move_to_end(id(failures))
+            failures_json = entry[2]
+        else:
+            failures_json = _dump_payload(failures)
+            # The entry holds a reference to the list, so its id can't be reused while cached
+            self._encoded_failures[id(failures)] = (failures, len(failures), failures_json)
+            while len(self._encoded_failures) > _ENCODED_FAILURES_CACHE_SIZE:
+                self._encoded_failures.popitem(last=False)
+
+        return b''.join((
+            _dump_payload(fields)[:-1],
+            b',"context":{"test_failures":', failures_json,
+            b',"test_summary":', _dump_payload(context.test_summary),
+            b',"log_excerpts":', _dump_payload(context.log_excerpts),
+            b',"must_gather_info":', _dump_payload(context.must_gather_info),
+            b'}}'
+        ))
+
+    def _post(self, endpoint: str, body: bytes, headers: Dict[str, str]):
+        """
+        Start a POST to the MCP server, gzip-compressing large bodies if enabled
+
+        Args:
+            endpoint: Server path (e.g. '/api/analyze')
+            body: Encoded request body
+            headers: Request headers
+
+        Returns:
+            aiohttp request context manager
+        """
+        if self.compress_requests and len(body) >= _COMPRESS_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=_COMPRESS_LEVEL)
+            headers = {**headers, "Content-Encoding": "gzip"}
+
+        return self.session.post(f"{self.server_url}{endpoint}", data=body, headers=headers)
+
+    async def _sse_post(self, endpoint: str, body: bytes, what: str) -> AsyncIterator[str]:
+        """
+        POST a request and stream the text of its Server-Sent Events response
+
+        Args:
+            endpoint: Server path (e.g. '/api/analyze')
+            body: Encoded request body
+            what: Request kind for log messages (e.g. 'analysis')
+
+        Returns:
+            AsyncIterator[str]: Response text, or an '[Error: ...]' chunk on failure
+        """
         try:
-            async with self.session.post(
-                f"{self.server_url}/api/analyze",
-                json=payload,
-                headers={"Accept": "text/event-stream"}
-            ) as response:
+            async with self._post(endpoint, body, _SSE_HEADERS) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     yield f"[Error: MCP server returned {response.status}: {error_text}]"
                     return
 
                 # Process Server-Sent Events
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
-
-                    if line.startswith('data: '):
-                        data = line[6:]  # Remove 'data: ' prefix
-
-                        if data == '[DONE]':
-                            break
-
-                        try:
-                            chunk = json.loads(data)
-                            if 'text' in chunk:
-                                yield chunk['text']
-                        except json.JSONDecodeError:
-                            # Plain text chunk
-                            yield data
+                async for text in _iter_sse_text(response):
+                    yield text
 
         except aiohttp.ClientError as e:
-            logger.error(f"MCP streaming failed: {e}")
+            logger.error(f"MCP {what} streaming failed: {e}")
             yield f"\n\n[Error: {str(e)}]"
         except Exception as e:
-            logger.error(f"MCP streaming error: {e}")
+            logger.error(f"MCP {what} streaming error: {e}")
             yield f"\n\n[Error: {str(e)}]"
 
-    async def _complete_analysis(self, payload: Dict) -> AnalysisResult:
+    def _stream_analysis(self, body: bytes) -> AsyncIterator[str]:
+        """Stream analysis response from MCP server"""
+        return self._sse_post('/api/analyze', body, 'analysis')
+
+    async def _complete_analysis(self, body: bytes) -> AnalysisResult:
         """Complete analysis response from MCP server"""
         try:
-            async with self.session.post(
-                f"{self.server_url}/api/analyze",
-                json=payload
-            ) as response:
+            async with self._post('/api/analyze', body, _JSON_HEADERS) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise RuntimeError(f"MCP server returned {response.status}: {error_text}")
 
-                result_data = await response.json()
+                result_data = _load_json(await response.read())
 
                 # Convert MCP response to AnalysisResult
                 result = AnalysisResult(
@@ -198,73 +381,36 @@ class MCPPlugin(AIBackendPlugin):
             raise RuntimeError("MCP plugin not initialized")
 
         # Build chat request payload
-        payload = {
+        body = self._encode_request({
             "action": "chat",
             "message": message,
             "history": history,
-            "context": context.to_dict(),
             "stream": stream
-        }
+        }, context)
 
         try:
             if stream:
-                return self._stream_chat_response(payload)
+                return self._stream_chat_response(body)
             else:
-                return await self._complete_chat_response(payload)
+                return await self._complete_chat_response(body)
 
         except Exception as e:
             logger.error(f"MCP chat failed: {e}")
             raise
 
-    async def _stream_chat_response(self, payload: Dict) -> AsyncIterator[str]:
+    def _stream_chat_response(self, body: bytes) -> AsyncIterator[str]:
         """Stream chat response from MCP server"""
-        try:
-            async with self.session.post(
-                f"{self.server_url}/api/chat",
-                json=payload,
-                headers={"Accept": "text/event-stream"}
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    yield f"[Error: MCP server returned {response.status}: {error_text}]"
-                    return
-
-                # Process Server-Sent Events
-                async for line in response.content:
-                    line = line.decode('utf-8').strip()
-
-                    if line.startswith('data: '):
-                        data = line[6:]
-
-                        if data == '[DONE]':
-                            break
-
-                        try:
-                            chunk = json.loads(data)
-                            if 'text' in chunk:
-                                yield chunk['text']
-                        except json.JSONDecodeError:
-                            yield data
-
-        except aiohttp.ClientError as e:
-            logger.error(f"MCP chat streaming failed: {e}")
-            yield f"\n\n[Error: {str(e)}]"
-        except Exception as e:
-            logger.error(f"MCP chat error: {e}")
-            yield f"\n\n[Error: {str(e)}]"
+        return self._sse_post('/api/chat', body, 'chat')
 
-    async def _complete_chat_response(self, payload: Dict) -> str:
+    async def _complete_chat_response(self, body: bytes) -> str:
         """Complete chat response from MCP server"""
         try:
-            async with self.session.post(
-                f"{self.server_url}/api/chat",
-                json=payload
-            ) as response:
+            async with self._post('/api/chat', body, _JSON_HEADERS) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise RuntimeError(f"MCP server returned {response.status}: {error_text}")
 
-                result = await response.json()
+                result = _load_json(await response.read())
                 return result.get('response', '')
 
         except aiohttp.ClientError as e:
@@ -287,7 +433,7 @@ class MCPPlugin(AIBackendPlugin):
         try:
             async with self.session.get(
                 f"{self.server_url}/health",
-                timeout=aiohttp.ClientTimeout(total=5)
+                timeout=_HEALTH_TIMEOUT
             ) as response:
                 return response.status == 200
 
@@ -295,21 +441,17 @@ class MCPPlugin(AIBackendPlugin):
             logger.error(f"MCP health check failed: {e}")
             return False
 
-    async def cleanup(self):
-        """Cleanup resources"""
+    async def cleanup(self) -> None:
+        """Close the HTTP session and its pooled connections"""
+        if self._finalizer:
+            self._finalizer.detach()
+            self._finalizer = None
         if self.session:
             await self.session.close()
             self.session = None
 
-    def __del__(self):
-        """Ensure session is closed"""
-        if self.session and not self.session.closed:
-            try:
-                import asyncio
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self.cleanup())
-                else:
-                    loop.run_until_complete(self.cleanup())
-            except Exception:
-                pass
+    async def __aenter__(self) -> 'MCPPlugin':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.cleanup()
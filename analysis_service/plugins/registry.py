@@ -3,19 +3,41 @@ Plugin Registry
 Manages AI backend plugin registration and discovery
 """
 
-from typing import Dict, List, Optional
+from importlib import import_module
+from importlib.util import find_spec
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional
+import asyncio
 import logging
+import sys
 
 from analysis_service.plugins.base import AIBackendPlugin
 
 logger = logging.getLogger(__name__)
 
+# Known backends: name -> (plugin module, plugin class, module the backend requires)
+_KNOWN_PLUGINS = {
+    'gemini': ('analysis_service.plugins.gemini_plugin', 'GeminiPlugin', 'google.genai'),
+    'claude': ('analysis_service.plugins.claude_plugin', 'ClaudePlugin', 'anthropic'),
+    'mcp': ('analysis_service.plugins.mcp_plugin', 'MCPPlugin', 'aiohttp'),
+}
+
+
+def _is_installed(module: str) -> bool:
+    """Whether a module can be imported, checked without importing it"""
+    try:
+        return find_spec(module) is not None
+    except ModuleNotFoundError:
+        # A parent package (e.g. 'google' for 'google.genai') is missing
+        return False
+
 
 class PluginRegistry:
     """Manages AI backend plugin registration and discovery"""
 
     def __init__(self):
-        self._plugins: Dict[str, AIBackendPlugin] = {}
+        # Read-only snapshot, replaced (never mutated) when a plugin registers
+        self._plugins: Mapping[str, AIBackendPlugin] = MappingProxyType({})
 
     def register(self, plugin: AIBackendPlugin) -> None:
         """
@@ -25,7 +47,9 @@ class PluginRegistry:
             plugin: Plugin instance to register
         """
         logger.info(f"Registering plugin: {plugin.name}")
-        self._plugins[plugin.name] = plugin
+        plugins = dict(self._plugins)
+        plugins[sys.intern(plugin.name)] = plugin
+        self._plugins = MappingProxyType(plugins)
 
     def get(self, name: str) -> Optional[AIBackendPlugin]:
         """
@@ -39,6 +63,42 @@ class PluginRegistry:
         """
         return self._plugins.get(name)
 
+    def discover(self, enabled: Optional[Iterable[str]] = None) -> None:
+        """
+        Import and register known backend plugins
+
+        Plugin modules (and the SDKs they load) are only imported for the
+        enabled backends whose required package is installed.
+
+        Args:
+            enabled: Backend names to register (None registers all known backends)
+        """
+        names = list(_KNOWN_PLUGINS) if enabled is None else list(enabled)
+        logger.info(f"Discovering AI plugins: {names}")
+
+        for name in names:
+            if name in self._plugins:
+                continue
+
+            known = _KNOWN_PLUGINS.get(name)
+            if known is None:
+                logger.warning(f"Unknown AI backend: {name}")
+                continue
+
+            module_name, class_name, requirement = known
+            if not _is_installed(requirement):
+                logger.warning(f"{name} plugin not available: {requirement} is not installed")
+                continue
+
+            try:
+                plugin_class = getattr(import_module(module_name), class_name)
+                self.register(plugin_class())
+                logger.info(f"Registered {name} plugin")
+            except Exception as e:
+                logger.error(f"Error registering {name} plugin: {e}")
+
+        logger.info(f"Plugin discovery complete. Available plugins: {self.get_available_plugins()}")
+
     def list_available(self) -> List[Dict]:
         """
         List all registered plugins
@@ -58,18 +118,39 @@ class PluginRegistry:
 
     async def initialize_all(self, config: Dict) -> None:
         """
-        Initialize all plugins
+        Initialize all plugins concurrently
 
         Args:
             config: Configuration dictionary with plugin-specific configs
         """
-        for plugin in self._plugins.values():
-            plugin_config = config.get(plugin.name, {})
-            try:
-                await plugin.initialize(plugin_config)
-                logger.info(f"Initialized plugin: {plugin.name}")
-            except Exception as e:
-                logger.error(f"Failed to initialize plugin {plugin.name}: {e}")
+        await asyncio.gather(
+            *(self._init_one(plugin, config.get(plugin.name, {})) for plugin in self._plugins.values()),
+            return_exceptions=True
+        )
+
+    @staticmethod
+    async def _init_one(plugin: AIBackendPlugin, plugin_config: Dict) -> None:
+        """Initialize one plugin, logging (not raising) any failure"""
+        try:
+            await plugin.initialize(plugin_config)
+            logger.info(f"Initialized plugin: {plugin.name}")
+        except Exception as e:
+            logger.error(f"Failed to initialize plugin {plugin.name}: {e}")
+
+    async def cleanup_all(self) -> None:
+        """Release the resources of all plugins"""
+        await asyncio.gather(
+            *(self._cleanup_one(plugin) for plugin in self._plugins.values()),
+            return_exceptions=True
+        )
+
+    @staticmethod
+    async def _cleanup_one(plugin: AIBackendPlugin) -> None:
+        """Clean up one plugin, logging (not raising) any failure"""
+        try:
+            await plugin.cleanup()
+        except Exception as e:
+            logger.error(f"Failed to clean up plugin {plugin.name}: {e}")
 
     def get_available_plugins(self) -> List[str]:
         """
@@ -89,40 +170,4 @@ def auto_discover_plugins():
     """
     Auto-discover and register all available plugins
     """
-    logger.info("Auto-discovering AI plugins...")
-
-    # Try to import and register Gemini plugin
-    try:
-        from analysis_service.plugins.gemini_plugin import GeminiPlugin
-        registry.register(GeminiPlugin())
-        logger.info("Registered Gemini plugin")
-    except ImportError as e:
-        logger.warning(f"Gemini plugin not available: {e}")
-    except Exception as e:
-        logger.error(f"Error registering Gemini plugin: {e}")
-
-    # Try to import and register Claude plugin
-    try:
-        from analysis_service.plugins.claude_plugin import ClaudePlugin
-        registry.register(ClaudePlugin())
-        logger.info("Registered Claude plugin")
-    except ImportError as e:
-        logger.warning(f"Claude plugin not available: {e}")
-    except Exception as e:
-        logger.error(f"Error registering Claude plugin: {e}")
-
-    # Try to import and register MCP plugin
-    try:
-        from analysis_service.plugins.mcp_plugin import MCPPlugin
-        registry.register(MCPPlugin())
-        logger.info("Registered MCP plugin")
-    except ImportError as e:
-        logger.warning(f"MCP plugin not available: {e}")
-    except Exception as e:
-        logger.error(f"Error registering MCP plugin: {e}")
-
-    logger.info(f"Plugin discovery complete. Available plugins: {registry.get_available_plugins()}")
-
-
-# Auto-discover plugins on module import
-auto_discover_plugins()
+    registry.discover()
@@ -0,0 +1,95 @@
+"""
+LLM Response Cache
+Bounded TTL cache for complete (non-streaming) AI backend responses
+"""
+
+from collections import OrderedDict
+from typing import Any, Optional
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Responses sampled above this temperature vary from call to call, so a
+# cached answer would hide that variation; they are never cached
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
+
+class ResponseCache:
+    """LRU cache of AI responses whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600.0):
+        """
+        Args:
+            maxsize: Maximum number of cached responses
+            ttl: Seconds a cached response stays valid
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Build a cache key from the request that produced a response
+
+        Args:
+            parts: JSON-serializable request parts (model, prompts, messages, ...)
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(temperature: Optional[float]) -> bool:
+        """Whether responses sampled at this temperature may be cached (None means the backend default)"""
+        return temperature is not None and temperature <= MAX_CACHEABLE_TEMPERATURE
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            The cached response, or None if absent or expired
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a response, evicting the least recently used entry when full
+
+        Args:
+            key: Key from make_key()
+            value: Response to cache
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached responses"""
+        self._entries.clear()
+
+
+# Global cache shared by the AI backend plugins; keys include the backend and model
+response_cache = ResponseCache()
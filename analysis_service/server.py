@@ -6,17 +6,36 @@ Handles tempest test result parsing and AI-powered failure analysis
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Optional, AsyncIterator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, AsyncIterator, Tuple
+import asyncio
 import logging
 import os
 import json
+import threading
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as _DefaultResponse
+
+    def _dump_event(payload: dict) -> bytes:
+        return orjson.dumps(payload)
+except ImportError:
+    from fastapi.responses import JSONResponse as _DefaultResponse
+
+    def _dump_event(payload: dict) -> bytes:
+        return json.dumps(payload).encode('utf-8')
 
 from analysis_service.parsers.tempest_xml import TempestXMLParser
 from analysis_service.parsers.rhcert_xml import RHCertXMLParser
 from analysis_service.parsers.rhcert_attachment_parser import RHCertAttachmentParser
-from analysis_service.parsers.mustgather import MustGatherParser
+from analysis_service.parsers.mustgather import MustGatherParser, is_noise_dir
+from analysis_service.parsers.dir_index import DirIndex, iter_dirs
 from analysis_service.plugins.registry import registry
+from analysis_service.plugins.http_client import close_shared_async_client
 from analysis_service.plugins.base import AnalysisContext
 
 # Setup logging
@@ -26,7 +45,9 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="File Extractor Analysis Service",
     description="AI-powered test result analysis and failure correlation",
-    version="1.0.0"
+    version="1.0.0",
+    # Parse results can hold thousands of failures; orjson serializes them much faster
+    default_response_class=_DefaultResponse
 )
 
 # CORS
@@ -66,13 +87,159 @@ class ChatRequest(BaseModel):
     stream: bool = False
 
 
-# Global storage for parsed test results (in production, use database)
-test_results_cache = {}
+# Global storage for parsed test results (in production, use database):
+# (job_id, test_folder) -> (source fingerprint, results), least recently used first
+test_results_cache: OrderedDict = OrderedDict()
+_TEST_RESULTS_CACHE_SIZE = 64
+
+# Server-Sent Event framing; events are sent as bytes so nothing is re-encoded per chunk
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+
+def _sse_event(payload: dict) -> bytes:
+    """Format a JSON payload as one Server-Sent Event"""
+    return b"".join((_SSE_PREFIX, _dump_event(payload), _SSE_SUFFIX))
+
+
+# Discovery results per (extract_path, kind), valid while the path's mtime is unchanged.
+# Discovery endpoints run on the threadpool, so the cache is guarded by a lock.
+_discover_cache: OrderedDict = OrderedDict()
+_discover_cache_lock = threading.Lock()
+_DISCOVER_CACHE_SIZE = 128
+
+# Discovery name filters; rhcert files are filtered on the suffix first, as few files are XML
+_RHOSO_PREFIX = 'rhoso'
+_RHCERT_PREFIX = 'rhcert-results-'
+_RHCERT_SUFFIXES = ('.xml',)
+# Failures whose must-gather logs are searched at once, and the file-reading
+# threads shared among those searches (MustGatherParser's own default)
+_CORRELATE_WORKERS = 8
+_CORRELATE_SCAN_THREADS = min(32, (os.cpu_count() or 1) * 4)
+
+# Large subtrees that never contain discovery targets and aren't walked
+_DISCOVER_PRUNE_DIRS = frozenset({'must-gather', 'rhcert_attachments', '.git', 'node_modules'})
+
+
+def _prune_discovery(entry: os.DirEntry) -> bool:
+    """Whether a discovery walk should skip this directory's contents"""
+    return entry.name in _DISCOVER_PRUNE_DIRS
+
+
+def _prune_rhoso_discovery(entry: os.DirEntry) -> bool:
+    """Like _prune_discovery, and also skip inside RHOSO folders (they aren't nested)"""
+    return entry.name in _DISCOVER_PRUNE_DIRS or entry.name.startswith(_RHOSO_PREFIX)
+
+
+def _cached_discovery(extract_path: str, kind: str, discover: Callable[[], List[dict]]) -> List[dict]:
+    """
+    Run a discovery walk, or reuse its result for an unchanged extraction path
+
+    Args:
+        extract_path: Extraction directory being searched
+        kind: Discovery kind (e.g. 'rhoso', 'rhcert')
+        discover: Walks the tree and returns the discovered entries
+
+    Returns:
+        List of discovered entries
+    """
+    key = (extract_path, kind)
+    mtime = os.stat(extract_path).st_mtime_ns
+
+    with _discover_cache_lock:
+        cached = _discover_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            _discover_cache.move_to_end(key)
+            return cached[1]
+
+    # Walk outside the lock so other paths aren't held up
+    result = discover()
+
+    with _discover_cache_lock:
+        _discover_cache[key] = (mtime, result)
+        _discover_cache.move_to_end(key)
+        while len(_discover_cache) > _DISCOVER_CACHE_SIZE:
+            _discover_cache.popitem(last=False)
+
+    return result
+
+
+def _results_source(extract_path: str, test_folder: str) -> Tuple[Optional[Tuple[int, ...]], Optional[DirIndex]]:
+    """
+    Identify the current version of a test folder's results source
+
+    Checks the same sources as parse_tempest_results, in the same order.
+
+    Returns:
+        (fingerprint, attachments index): the fingerprint is (mtime_ns, size)
+        of tempest_results.xml, else that of the rhcert attachments' validation
+        reports, or None if neither exists. The index of the attachments (None
+        unless they are the source) is for the parse, so it reads the files
+        that were fingerprinted without walking them again.
+    """
+    try:
+        st = os.stat(os.path.join(extract_path, test_folder, 'tempest_results.xml'))
+    except OSError:
+        parser = RHCertAttachmentParser(extract_path, '')
+        if not os.path.isdir(parser.attachments_dir):
+            return None, None
+        attachments_index = DirIndex(parser.attachments_dir)
+        return parser.source_fingerprint(attachments_index), attachments_index
+    return (st.st_mtime_ns, st.st_size), None
+
+
+async def _get_test_results(job_id: str, test_folder: str, extract_path: str) -> Dict:
+    """
+    Get parsed test results, parsing (on the threadpool) on a miss or when the source changed
+
+    Args:
+        job_id: Job ID
+        test_folder: Test folder within the extraction path
+        extract_path: Extraction directory
+
+    Returns:
+        Parsed test results (see parse_tempest_results)
+    """
+    cache_key = (job_id, test_folder)
+    # Fingerprinting RHOSP results walks the attachments, so it runs off the event loop
+    fingerprint, attachments_index = await run_in_threadpool(_results_source, extract_path, test_folder)
+
+    cached = test_results_cache.get(cache_key)
+    if cached is not None and cached[0] == fingerprint:
+        test_results_cache.move_to_end(cache_key)
+        return cached[1]
+
+    parse_req = ParseRequest(
+        job_id=job_id,
+        test_folder=test_folder,
+        extract_path=extract_path
+    )
+    results = await run_in_threadpool(_parse_test_folder, parse_req, attachments_index)
+
+    test_results_cache[cache_key] = (fingerprint, results)
+    test_results_cache.move_to_end(cache_key)
+    while len(test_results_cache) > _TEST_RESULTS_CACHE_SIZE:
+        test_results_cache.popitem(last=False)
+
+    return results
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize AI plugins on startup"""
+    # uvicorn[standard] installs uvloop and uvicorn's default loop="auto" picks it
+    # up; the stdlib loop here means uvloop is missing (or unsupported, e.g. Windows)
+    loop_type = type(asyncio.get_running_loop())
+    logger.info(f"Event loop: {loop_type.__module__}.{loop_type.__name__}")
+
+    # Only the listed backends are imported (default: all known backends)
+    enabled_backends = os.getenv('AI_BACKENDS')
+    registry.discover(
+        [name.strip() for name in enabled_backends.split(',') if name.strip()]
+        if enabled_backends else None
+    )
+
     logger.info("Initializing AI backend plugins...")
 
     config = {
@@ -83,10 +250,23 @@ async def startup_event():
             'api_key': os.getenv('CLAUDE_API_KEY', '')
         },
         'mcp': {
-            'server_url': os.getenv('MCP_SERVER_URL', 'http://localhost:9000')
+            'server_url': os.getenv('MCP_SERVER_URL', 'http://localhost:9000'),
+            'compress_requests': os.getenv('MCP_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
         }
     }
 
+    # Optional sampling temperatures; low ones also enable response caching
+    for backend, env_var in (('gemini', 'GEMINI_TEMPERATURE'), ('claude', 'CLAUDE_TEMPERATURE')):
+        temperature = os.getenv(env_var)
+        if temperature:
+            config[backend]['temperature'] = float(temperature)
+
+    # Optional per-request timeout for the AI backends (timed-out requests are retried)
+    request_timeout = os.getenv('AI_REQUEST_TIMEOUT')
+    if request_timeout:
+        for backend in ('gemini', 'claude'):
+            config[backend]['request_timeout'] = float(request_timeout)
+
     try:
         await registry.initialize_all(config)
         available = registry.get_available_plugins()
@@ -95,6 +275,13 @@ async def startup_event():
         logger.error(f"Error initializing plugins: {e}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled AI backend connections on shutdown"""
+    await registry.cleanup_all()
+    await close_shared_async_client()
+
+
 @app.get("/")
 def root():
     """Health check endpoint"""
@@ -106,7 +293,7 @@ def root():
 
 
 @app.post("/api/analysis/discover")
-async def discover_rhoso_folders(request: DiscoverRequest):
+def discover_rhoso_folders(request: DiscoverRequest):
     """
     Discover RHOSO test folders in extracted archive
 
@@ -121,29 +308,33 @@ async def discover_rhoso_folders(request: DiscoverRequest):
     if not os.path.exists(extract_path):
         raise HTTPException(status_code=404, detail="Extraction path not found")
 
-    rhoso_folders = []
+    def discover() -> List[dict]:
+        rhoso_folders = []
 
-    # Walk through extraction directory
-    for root, dirs, files in os.walk(extract_path):
-        for dir_name in dirs:
-            if dir_name.startswith('rhoso'):
-                dir_path = os.path.join(root, dir_name)
+        # Walk through extraction directory
+        for entry in iter_dirs(extract_path, _prune_rhoso_discovery):
+            if entry.name.startswith(_RHOSO_PREFIX):
+                dir_path = entry.path
                 rel_path = os.path.relpath(dir_path, extract_path)
 
                 # Check for tempest XML result file (only XML supported)
                 has_xml = os.path.exists(os.path.join(dir_path, 'tempest_results.xml'))
 
-                # Check for must-gather folder
-                has_mustgather = os.path.exists(os.path.join(dir_path, 'must-gather'))
-
                 if has_xml:
+                    # Check for must-gather folder
+                    has_mustgather = os.path.exists(os.path.join(dir_path, 'must-gather'))
+
                     rhoso_folders.append({
-                        'name': dir_name,
+                        'name': entry.name,
                         'path': rel_path,
                         'has_xml': has_xml,
                         'has_mustgather': has_mustgather
                     })
 
+        return rhoso_folders
+
+    rhoso_folders = _cached_discovery(extract_path, 'rhoso', discover)
+
     logger.info(f"Discovered {len(rhoso_folders)} RHOSO test folders for job {request.job_id}")
 
     return {
@@ -154,7 +345,7 @@ async def discover_rhoso_folders(request: DiscoverRequest):
 
 
 @app.post("/api/analysis/discover-rhcert")
-async def discover_rhcert_files(request: DiscoverRequest):
+def discover_rhcert_files(request: DiscoverRequest):
     """
     Discover Red Hat Certification XML files in extracted archive
 
@@ -169,25 +360,28 @@ async def discover_rhcert_files(request: DiscoverRequest):
     if not os.path.exists(extract_path):
         raise HTTPException(status_code=404, detail="Extraction path not found")
 
-    rhcert_files = []
+    def discover() -> List[dict]:
+        rhcert_files = []
 
-    # Walk through extraction directory
-    for root, dirs, files in os.walk(extract_path):
-        for file_name in files:
-            if file_name.startswith('rhcert-results-') and file_name.endswith('.xml'):
-                file_path = os.path.join(root, file_name)
-                rel_path = os.path.relpath(file_path, extract_path)
+        # Walk through extraction directory
+        for entry in DirIndex(extract_path, _prune_discovery).iter_by_ext(_RHCERT_SUFFIXES):
+            if entry.name.startswith(_RHCERT_PREFIX):
+                rel_path = os.path.relpath(entry.path, extract_path)
 
-                # Get file size
-                file_size = os.path.getsize(file_path)
+                # Get file size (stat result is cached on the entry)
+                file_size = entry.stat().st_size
 
                 rhcert_files.append({
-                    'name': file_name,
+                    'name': entry.name,
                     'path': rel_path,
                     'size': file_size,
                     'size_mb': round(file_size / (1024 * 1024), 2)
                 })
 
+        return rhcert_files
+
+    rhcert_files = _cached_discovery(extract_path, 'rhcert', discover)
+
     logger.info(f"Discovered {len(rhcert_files)} rhcert XML files for job {request.job_id}")
 
     return {
@@ -198,13 +392,28 @@ async def discover_rhcert_files(request: DiscoverRequest):
 
 
 @app.post("/api/analysis/parse")
-async def parse_tempest_results(request: ParseRequest):
+def parse_tempest_results(request: ParseRequest):
     """
     Parse tempest test results from XML files only
 
     Args:
         request: ParseRequest with job details
 
+    Returns:
+        Parsed test results with failures, errors, skipped tests and statistics
+    """
+    return _parse_test_folder(request)
+
+
+def _parse_test_folder(request: ParseRequest, attachments_index: Optional[DirIndex] = None) -> Dict:
+    """
+    Parse a test folder's results (see parse_tempest_results)
+
+    Args:
+        request: ParseRequest with job details
+        attachments_index: Optional prebuilt index of the rhcert attachments
+            directory, used if the results come from RHOSP attachments
+
     Returns:
         Parsed test results with failures, errors, skipped tests and statistics
     """
@@ -245,10 +454,11 @@ async def parse_tempest_results(request: ParseRequest):
             results.update(xml_results)
             results['source'] = 'xml'
 
-            # Separate skipped tests from failures
-            all_items = results.get('failures', [])
-            failures = [item for item in all_items if item['failure_type'] != 'skip']
-            skipped_tests = [item for item in all_items if item['failure_type'] == 'skip']
+            # Separate skipped tests from failures in one pass
+            failures = []
+            skipped_tests = []
+            for item in results.get('failures', []):
+                (skipped_tests if item['failure_type'] == 'skip' else failures).append(item)
 
             results['failures'] = failures
             results['skipped_tests'] = skipped_tests
@@ -270,7 +480,7 @@ async def parse_tempest_results(request: ParseRequest):
                 # extract_path already includes job_id (e.g., extracted/job-id/)
                 # So we pass extract_path directly, and empty string for job_id since it's already in the path
                 parser = RHCertAttachmentParser(request.extract_path, '')
-                attachment_results = parser.parse()
+                attachment_results = parser.parse(dir_index=attachments_index)
 
                 # Convert to format expected by AI analysis
                 results['total_tests'] = attachment_results['total_tests']
@@ -294,14 +504,28 @@ async def parse_tempest_results(request: ParseRequest):
         mustgather_path = os.path.join(test_folder_path, 'must-gather')
         if os.path.exists(mustgather_path):
             try:
-                mg_parser = MustGatherParser()
-                # Correlate failures with logs (simplified for now)
-                for failure in results['failures']:
-                    failure['correlated_logs'] = mg_parser.find_related_logs(
+                failures = results['failures']
+                workers = max(1, min(_CORRELATE_WORKERS, len(failures)))
+                # Split the scan threads among concurrent searches so one
+                # parse never runs more than _CORRELATE_SCAN_THREADS readers
+                mg_parser = MustGatherParser(max_workers=max(1, _CORRELATE_SCAN_THREADS // workers))
+                # Walk the must-gather tree once and share it across failures
+                mg_index = DirIndex(mustgather_path, prune=is_noise_dir)
+
+                def correlate(failure: dict) -> List[str]:
+                    return mg_parser.find_related_logs(
                         mustgather_path,
                         failure.get('test_name', ''),
-                        failure.get('error_message', '')
+                        failure.get('error_message', ''),
+                        dir_index=mg_index
                     )
+
+                # Correlate failures with logs (simplified for now); failures
+                # are independent, so they are searched concurrently
+                if failures:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        for failure, logs in zip(failures, executor.map(correlate, failures)):
+                            failure['correlated_logs'] = logs
             except Exception as e:
                 logger.error(f"Error parsing must-gather: {e}")
 
@@ -309,7 +533,7 @@ async def parse_tempest_results(request: ParseRequest):
 
 
 @app.post("/api/analysis/parse-rhcert")
-async def parse_rhcert_results(request: ParseRequest):
+def parse_rhcert_results(request: ParseRequest):
     """
     Parse Red Hat Certification test results from XML file
 
@@ -354,14 +578,12 @@ async def parse_rhcert_results(request: ParseRequest):
         return results
 
     except Exception as e:
-        logger.error(f"Error parsing rhcert XML: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error parsing rhcert XML: {e}")
         raise HTTPException(status_code=500, detail=f"Error parsing rhcert XML: {str(e)}")
 
 
 @app.post("/api/analysis/parse-rhcert-attachments")
-async def parse_rhcert_attachments(request: DiscoverRequest):
+def parse_rhcert_attachments(request: DiscoverRequest):
     """
     Parse test results from rhcert XML attachments (neutron, cinder, manila)
 
@@ -401,9 +623,7 @@ async def parse_rhcert_attachments(request: DiscoverRequest):
         return results
 
     except Exception as e:
-        logger.error(f"Error parsing rhcert attachments: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error parsing rhcert attachments: {e}")
         raise HTTPException(status_code=500, detail=f"Error parsing rhcert attachments: {str(e)}")
 
 
@@ -415,9 +635,7 @@ async def list_ai_backends():
     Returns:
         List of available AI backends with their capabilities
     """
-    # Import registry
     try:
-        from analysis_service.plugins.registry import registry
         available = registry.list_available()
     except Exception as e:
         logger.warning(f"Plugin registry not fully initialized: {e}")
@@ -455,18 +673,7 @@ async def analyze_failures(request: AnalyzeRequest):
         )
 
     # Get or parse test results
-    cache_key = f"{request.job_id}:{request.test_folder}"
-    if cache_key not in test_results_cache:
-        # Parse test results
-        parse_req = ParseRequest(
-            job_id=request.job_id,
-            test_folder=request.test_folder,
-            extract_path=request.extract_path
-        )
-        parsed_results = await parse_tempest_results(parse_req)
-        test_results_cache[cache_key] = parsed_results
-
-    results = test_results_cache[cache_key]
+    results = await _get_test_results(request.job_id, request.test_folder, request.extract_path)
 
     # Build analysis context
     context = AnalysisContext(
@@ -485,18 +692,18 @@ async def analyze_failures(request: AnalyzeRequest):
     try:
         if request.stream and plugin.supports_streaming:
             # Return SSE stream
-            async def event_stream() -> AsyncIterator[str]:
+            async def event_stream() -> AsyncIterator[bytes]:
                 try:
                     # Get the async generator from the plugin (no await - it's already a generator)
                     generator = plugin.analyze_failures(context, stream=True)
                     async for chunk in generator:
                         # Format as Server-Sent Event
-                        yield f"data: {json.dumps({'text': chunk})}\n\n"
+                        yield _sse_event({'text': chunk})
                 except Exception as e:
                     logger.error(f"Streaming error: {e}")
-                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    yield _sse_event({'error': str(e)})
                 finally:
-                    yield "data: [DONE]\n\n"
+                    yield _SSE_DONE
 
             return StreamingResponse(
                 event_stream(),
@@ -547,17 +754,7 @@ async def chat_about_failures(request: ChatRequest):
         )
 
     # Get or parse test results for context
-    cache_key = f"{request.job_id}:{request.test_folder}"
-    if cache_key not in test_results_cache:
-        parse_req = ParseRequest(
-            job_id=request.job_id,
-            test_folder=request.test_folder,
-            extract_path=request.extract_path
-        )
-        parsed_results = await parse_tempest_results(parse_req)
-        test_results_cache[cache_key] = parsed_results
-
-    results = test_results_cache[cache_key]
+    results = await _get_test_results(request.job_id, request.test_folder, request.extract_path)
 
     # Build analysis context
     context = AnalysisContext(
@@ -575,7 +772,7 @@ async def chat_about_failures(request: ChatRequest):
     try:
         if request.stream and plugin.supports_streaming:
             # Return SSE stream
-            async def event_stream() -> AsyncIterator[str]:
+            async def event_stream() -> AsyncIterator[bytes]:
                 try:
                     # Get async generator directly (no await - it's already a generator)
                     generator = plugin.chat(
@@ -585,12 +782,12 @@ async def chat_about_failures(request: ChatRequest):
                         stream=True
                     )
                     async for chunk in generator:
-                        yield f"data: {json.dumps({'text': chunk})}\n\n"
+                        yield _sse_event({'text': chunk})
                 except Exception as e:
                     logger.error(f"Chat streaming error: {e}")
-                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                    yield _sse_event({'error': str(e)})
                 finally:
-                    yield "data: [DONE]\n\n"
+                    yield _SSE_DONE
 
             return StreamingResponse(
                 event_stream(),